@@ -0,0 +1,191 @@
+import time
+import random
+import hashlib
+import threading
+import subprocess
+from typing import Dict, Any, Optional
+
+
+WORDS = (
+    "list find count files directory log archive compress sort unique "
+    "lines match pattern replace config backup user permission size "
+    "largest recent modified extract column total report hidden empty"
+).split()
+
+
+class FakeLLMError(RuntimeError):
+    pass
+
+
+def stable_seed(*parts) -> int:
+    digest = hashlib.blake2b(
+        "\0".join(str(part) for part in parts).encode(), digest_size=8
+    ).digest()
+    return int.from_bytes(digest, "little")
+
+
+def fake_value(schema: Dict[str, Any], rng: random.Random):
+    kind = schema.get("type")
+    if kind == "object":
+        return {
+            name: fake_value(prop, rng)
+            for name, prop in schema.get("properties", {}).items()
+        }
+    if kind == "array":
+        return [fake_value(schema.get("items", {}), rng) for _ in range(2)]
+    if kind == "integer":
+        return rng.randint(schema.get("minimum", 0), schema.get("maximum", 9))
+    if kind == "number":
+        return rng.random()
+    if kind == "boolean":
+        return rng.random() < 0.5
+    return " ".join(rng.choice(WORDS) for _ in range(8))
+
+
+class FakeJSONClient:
+    """
+    Stand-in for JSONClient that answers from the schema without a network.
+
+    Every answer, its latency and whether it fails are drawn from a seed
+    derived from `seed`, the prompt, `sample` and how often they were asked,
+    so reruns see the same sequence. Takes the JSONClient arguments, so
+    `functools.partial(FakeJSONClient, latency=...)` is a client_factory.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        system_prompt: str,
+        json_schema: Dict[str, Any],
+        top_p: float = 0.9,
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        latency: float = 0.05,
+        jitter: float = 0.5,
+        failure_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.model_name = model_name
+        self.system_prompt = system_prompt
+        self.json_schema = json_schema
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.seed = seed
+
+        self.lock = threading.Lock()
+        self.asked = {}
+        self.calls = 0
+        self.failures = 0
+        self.latencies = []
+        self.history = []
+        self.reset()
+
+    def reset(self):
+        self.history = [
+            {"role": "system", "content": self.system_prompt}
+        ]
+
+    def _request(self, messages, sample=None):
+        prompt = messages[-1]["content"]
+        with self.lock:
+            count = self.asked.get((prompt, sample), 0)
+            self.asked[(prompt, sample)] = count + 1
+            self.calls += 1
+
+        rng = random.Random(stable_seed(self.seed, prompt, sample, count))
+        delay = self.latency * (1 + self.jitter * (2 * rng.random() - 1))
+        time.sleep(delay)
+        with self.lock:
+            self.latencies.append(delay)
+
+        if rng.random() < self.failure_rate:
+            with self.lock:
+                self.failures += 1
+            raise FakeLLMError("injected failure")
+
+        return fake_value(self.json_schema["schema"], rng)
+
+    def generate_once(
+        self, input_text: str, sample: Optional[int] = None
+    ) -> Dict[str, Any]:
+        messages = self.history + [{"role": "user", "content": input_text}]
+        return self._request(messages, sample)
+
+    def generate(self, input_text: str) -> Dict[str, Any]:
+        self.history.append({"role": "user", "content": input_text})
+        structured_output = self._request(self.history)
+        self.history.append(
+            {"role": "assistant", "content": structured_output}
+        )
+        return structured_output
+
+
+class FakeSandbox:
+    """
+    In-process stand-in for Sandbox: commands are not run, each one just
+    takes `latency` seconds and gets an exit code drawn from a seeded RNG.
+    Setups always succeed, commands in `conditions` (the tasks' success
+    conditions) pass with `check_pass_rate` and any other command fails
+    with `exec_failure_rate`.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.005,
+        exec_failure_rate: float = 0.2,
+        check_pass_rate: float = 0.3,
+        output_bytes: int = 256,
+        conditions=(),
+        seed: int = 0,
+    ):
+        self.latency = latency
+        self.exec_failure_rate = exec_failure_rate
+        self.check_pass_rate = check_pass_rate
+        self.output_bytes = output_bytes
+        self.rng = random.Random(seed)
+        self.conditions = set(conditions)
+        self.dirty = False
+        self.calls = 0
+        self.init()
+
+    def init(self, image=None):
+        self.dirty = False
+
+    def kill(self):
+        pass
+
+    def reset(self):
+        self.init()
+
+    def close_shell(self):
+        pass
+
+    def snapshot_tag(self, setup_command: str):
+        return setup_command
+
+    def remove_snapshot(self, tag):
+        pass
+
+    def prepare(self, setup_command: str, timeout=30, snapshot=False):
+        return self._result(setup_command, 0)
+
+    def exec_shell(self, command: str, timeout=30, check=False):
+        failure_rate = self.exec_failure_rate
+        if command in self.conditions:
+            failure_rate = 1 - self.check_pass_rate
+        result = self._result(command, int(self.rng.random() < failure_rate))
+        if check:
+            result.check_returncode()
+        return result
+
+    def _result(self, command: str, rc: int):
+        self.dirty = True
+        self.calls += 1
+        time.sleep(self.latency)
+        return subprocess.CompletedProcess(
+            command,
+            rc,
+            "o" * self.output_bytes,
+            "e" * (self.output_bytes // 4) if rc else "",
+        )
@@ -0,0 +1,97 @@
+import time
+import argparse
+
+import torch
+
+from nash.clients.local_client import LocalClient, cpu_bf16_supported
+
+
+MODEL_NAME = "Qwen/Qwen2.5-0.5B-Instruct"
+
+PROMPT = "List the five largest files under /var/log with their sizes."
+
+# (label, LocalClient keyword arguments)
+SETTINGS = [
+    ("float32", {"dtype": "float32"}),
+    ("bfloat16", {"dtype": "bfloat16"}),
+    ("int8 dynamic", {"quantize": True}),
+    ("bfloat16 + compile", {"dtype": "bfloat16", "compile": True}),
+    ("int8 dynamic + compile", {"quantize": True, "compile": True}),
+]
+
+
+def measure(client: LocalClient, new_tokens: int, runs: int):
+    """
+    Prefill seconds and decode tokens/sec of one prompt, greedy and with
+    a fixed output length so every setting does the same work.
+    """
+    chat = client._chat(
+        client.history + [{"role": "user", "content": PROMPT}]
+    )
+    request = client.tokenizer(chat, return_tensors="pt").to(client.device)
+
+    def run(tokens):
+        start = time.perf_counter()
+        with torch.no_grad():
+            client.client.generate(
+                **request,
+                do_sample=False,
+                max_new_tokens=tokens,
+                min_new_tokens=tokens,
+                pad_token_id=client.tokenizer.pad_token_id,
+            )
+        return time.perf_counter() - start
+
+    # Warm up: first call pays for allocation, and compilation if any
+    run(new_tokens)
+
+    prefill = min(run(1) for _ in range(runs))
+    total = min(run(new_tokens) for _ in range(runs))
+    decode = max(total - prefill, 1e-9)
+    return {
+        "prompt_tokens": request.input_ids.shape[-1],
+        "prefill_seconds": prefill,
+        "tokens_per_second": (new_tokens - 1) / decode,
+    }
+
+
+def run(model_name=MODEL_NAME, num_threads=None, new_tokens=64, runs=3):
+    reports = {}
+    for label, options in SETTINGS:
+        if options.get("dtype") == "bfloat16" and not cpu_bf16_supported():
+            print(f"{label}: skipped, no bfloat16 support on this CPU")
+            continue
+        try:
+            client = LocalClient(
+                model_name,
+                "cpu",
+                "You are a helpful assistant.",
+                num_threads=num_threads,
+                prefix_cache=False,
+                **options,
+            )
+            reports[label] = measure(client, new_tokens, runs)
+        except Exception as e:
+            print(f"{label}: failed -> {e}")
+            continue
+
+        report = reports[label]
+        print(
+            f"{label}: {report['tokens_per_second']:.1f} tok/s, "
+            f"prefill {report['prefill_seconds'] * 1000:.0f} ms "
+            f"for {report['prompt_tokens']} tokens"
+        )
+    return reports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="LocalClient CPU throughput per inference setting"
+    )
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--new-tokens", type=int, default=64)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    run(args.model, args.threads, args.new_tokens, args.runs)
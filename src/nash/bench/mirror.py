@@ -0,0 +1,141 @@
+import io
+import gzip
+import lzma
+import time
+import tarfile
+import tempfile
+import threading
+from pathlib import Path
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+
+PACKAGES_PATH = "dists/forky/main/binary-amd64/Packages.xz"
+
+MAN_PAGE = """.TH {name} 1
+.SH NAME
+{name} \\- benchmark package {index}
+.SH DESCRIPTION
+{body}
+"""
+
+
+def ar_archive(members) -> bytes:
+    """
+    A System V ar archive, the container format of .deb files.
+    """
+    out = io.BytesIO()
+    out.write(b"!<arch>\n")
+    for name, data in members:
+        header = (
+            f"{name:<16}{0:<12}{0:<6}{0:<6}{'100644':<8}{len(data):<10}`\n"
+        )
+        out.write(header.encode())
+        out.write(data)
+        if len(data) % 2:
+            out.write(b"\n")
+    return out.getvalue()
+
+
+def tar_xz(files) -> bytes:
+    out = io.BytesIO()
+    with lzma.open(out, "wb") as xz, tarfile.open(fileobj=xz, mode="w") as tar:
+        for path, data in files.items():
+            info = tarfile.TarInfo(path)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return out.getvalue()
+
+
+def fake_deb(name: str, index: int, pages: int, page_bytes: int) -> bytes:
+    files = {}
+    body = ("lorem ipsum dolor sit amet " * page_bytes)[:page_bytes]
+    for page in range(pages):
+        man = MAN_PAGE.format(name=f"{name}{page}", index=index, body=body)
+        files[f"./usr/share/man/man1/{name}{page}.1.gz"] = gzip.compress(
+            man.encode()
+        )
+
+    control = {"./control": f"Package: {name}\n".encode()}
+    return ar_archive(
+        [
+            ("debian-binary", b"2.0\n"),
+            ("control.tar.xz", tar_xz(control)),
+            ("data.tar.xz", tar_xz(files)),
+        ]
+    )
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    latency = 0.0
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency)
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MirrorServer:
+    """
+    A Debian mirror on localhost for get_man.py: `packages` fake packages
+    with `pages` man pages each, listed in a Packages.xz, served over HTTP
+    with `latency` seconds added to every request.
+
+        with MirrorServer(packages=50) as mirror:
+            get_man.MIRROR = mirror.url
+    """
+
+    def __init__(
+        self,
+        packages: int = 20,
+        pages: int = 3,
+        page_bytes: int = 4096,
+        latency: float = 0.0,
+    ):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.filenames = []
+
+        for index in range(packages):
+            name = f"benchpkg{index}"
+            filename = f"pool/main/b/{name}/{name}_1.0_amd64.deb"
+            path = self.root / filename
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(fake_deb(name, index, pages, page_bytes))
+            self.filenames.append(filename)
+
+        listing = "".join(
+            f"Package: {Path(f).name.split('_')[0]}\nFilename: {f}\n\n"
+            for f in self.filenames
+        )
+        packages_path = self.root / PACKAGES_PATH
+        packages_path.parent.mkdir(parents=True, exist_ok=True)
+        packages_path.write_bytes(lzma.compress(listing.encode()))
+
+        handler = type("Handler", (QuietHandler,), {"latency": latency})
+        self.server = ThreadingHTTPServer(
+            ("127.0.0.1", 0), partial(handler, directory=str(self.root))
+        )
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True
+        )
+        self.thread.start()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address
+        return f"http://{host}:{port}/"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,357 @@
+import io
+import csv
+import json
+import time
+import random
+import argparse
+import tempfile
+import contextlib
+from pathlib import Path
+from functools import partial
+from statistics import mean, quantiles
+from concurrent.futures import ThreadPoolExecutor
+
+from nash.bench.fakes import FakeJSONClient, FakeSandbox, fake_value
+from nash.bench.mirror import MirrorServer, PACKAGES_PATH
+from nash.dataset.writer import JSONLWriter, read_records
+from nash.generation.prompts import GENERATOR_JSON_SCHEMA
+
+
+# A throughput drop or p90 rise beyond this fraction is a regression
+TOLERANCE = 0.2
+
+
+def summarize(values):
+    if not values:
+        return None
+    if len(values) == 1:
+        p50 = p90 = p99 = values[0]
+    else:
+        cuts = quantiles(values, n=100, method="inclusive")
+        p50, p90, p99 = cuts[49], cuts[89], cuts[98]
+    return {
+        "count": len(values),
+        "mean": mean(values),
+        "p50": p50,
+        "p90": p90,
+        "p99": p99,
+    }
+
+
+def recording_factory(clients, **options):
+    """
+    A client_factory handing out FakeJSONClients, kept in `clients` so
+    their call counts and latencies can be read after the run.
+    """
+    def factory(**kwargs):
+        client = FakeJSONClient(**kwargs, **options)
+        clients.append(client)
+        return client
+    return factory
+
+
+def llm_stats(clients):
+    return {
+        "calls": sum(client.calls for client in clients),
+        "failures": sum(client.failures for client in clients),
+        "latency": summarize(
+            [value for client in clients for value in client.latencies]
+        ),
+    }
+
+
+def write_seeds(path: Path, count: int, seed: int = 0):
+    rng = random.Random(seed)
+    with JSONLWriter(str(path), append=False) as writer:
+        writer.write_many(
+            fake_value(GENERATOR_JSON_SCHEMA["schema"], rng)
+            for _ in range(count)
+        )
+
+
+def bench_generator(
+    workdir: Path,
+    seeds: int = 41,
+    multiplier: int = 2,
+    workers: int = 8,
+    latency: float = 0.05,
+    failure_rate: float = 0.0,
+):
+    from nash.generation.generation import Generator
+
+    seed_path = workdir / "seeds.jsonl"
+    task_path = workdir / "tasks.jsonl"
+    write_seeds(seed_path, seeds)
+
+    clients = []
+    generator = Generator(
+        str(seed_path),
+        str(task_path),
+        multiplier=multiplier,
+        workers=workers,
+        client_factory=recording_factory(
+            clients, latency=latency, failure_rate=failure_rate
+        ),
+    )
+
+    start = time.monotonic()
+    with contextlib.redirect_stdout(io.StringIO()):
+        generator.generate()
+    elapsed = time.monotonic() - start
+    generator.close()
+
+    units = (seeds - 1) * multiplier
+    written = sum(1 for _ in read_records(str(task_path)))
+    return {
+        "units": units,
+        "written": written,
+        "seconds": elapsed,
+        "throughput": units / elapsed,
+        "llm": llm_stats(clients),
+    }
+
+
+def bench_solver(
+    workdir: Path,
+    tasks: int = 40,
+    attempts: int = 2,
+    workers: int = 8,
+    max_steps: int = 5,
+    latency: float = 0.02,
+    sandbox_latency: float = 0.005,
+):
+    from nash.generation.evaluate import Evaluator
+
+    task_path = workdir / "eval_tasks.jsonl"
+    result_path = workdir / "eval_results.jsonl"
+
+    rng = random.Random(1)
+    records = [
+        {
+            "difficulty": rng.randint(1, 5),
+            "description": fake_value({"type": "string"}, rng),
+            "setup_command": f"setup {index}",
+            "success_condition": f"check {index}",
+        }
+        for index in range(tasks)
+    ]
+    with JSONLWriter(str(task_path), append=False) as writer:
+        writer.write_many(records)
+
+    clients = []
+    evaluator = Evaluator(
+        str(task_path),
+        str(result_path),
+        attempts=attempts,
+        workers=workers,
+        max_steps=max_steps,
+        sandbox_factory=partial(
+            FakeSandbox,
+            latency=sandbox_latency,
+            conditions=[r["success_condition"] for r in records],
+        ),
+        client_factory=recording_factory(clients, latency=latency),
+    )
+
+    start = time.monotonic()
+    with contextlib.redirect_stdout(io.StringIO()):
+        evaluator.run()
+    elapsed = time.monotonic() - start
+
+    results = list(read_records(str(result_path)))
+    return {
+        "tasks": tasks,
+        "attempts": len(results),
+        "solved": sum(result["solved"] for result in results),
+        "seconds": elapsed,
+        "throughput": tasks / elapsed,
+        "latency": summarize([result["seconds"] for result in results]),
+        "stages": {
+            stage: summarize(values)
+            for stage, values in sorted(evaluator.timings.items())
+        },
+        "llm": llm_stats(clients),
+    }
+
+
+def bench_converter(
+    workdir: Path,
+    rows: int = 3,
+    latency: float = 0.05,
+    failure_rate: float = 0.0,
+):
+    from nash.seed.gen_seeds import CSVToJSONLConverter
+
+    csv_path = workdir / "rows.csv"
+    output_path = workdir / "converted.jsonl"
+
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(
+            [
+                "Prompt",
+                "Ground Truth Command",
+                "Functionally Equivalent Command",
+            ]
+        )
+        for index in range(rows):
+            writer.writerow(
+                [f"count lines in file {index}", "wc -l f", "cat f | wc -l"]
+            )
+
+    clients = []
+    converter = CSVToJSONLConverter(
+        client_factory=recording_factory(
+            clients, latency=latency, failure_rate=failure_rate
+        )
+    )
+
+    start = time.monotonic()
+    with contextlib.redirect_stdout(io.StringIO()):
+        converter.convert(str(csv_path), str(output_path))
+    elapsed = time.monotonic() - start
+
+    return {
+        "rows": rows,
+        "seconds": elapsed,
+        "throughput": rows / elapsed,
+        "llm": llm_stats(clients),
+    }
+
+
+def bench_get_man(
+    workdir: Path,
+    packages: int = 30,
+    pages: int = 3,
+    workers: int = 8,
+    latency: float = 0.01,
+):
+    from nash.rag import get_man
+
+    destdir = workdir / "man_pages"
+    get_man.DESTDIR = destdir
+    get_man.PKGLIST = destdir / "packages"
+    get_man.PROCESSED = destdir / "processed"
+    get_man.LOGFILE = destdir / "get_man.log"
+
+    with MirrorServer(packages, pages, latency=latency) as mirror, \
+            contextlib.redirect_stdout(io.StringIO()):
+        get_man.MIRROR = mirror.url
+        start = time.monotonic()
+
+        get_man.init()
+        get_man.download_package_list(mirror.url + PACKAGES_PATH)
+        with get_man.PKGLIST.open() as f:
+            listed = [line.strip() for line in f if line.strip()]
+
+        def timed(pkg):
+            pkg_start = time.monotonic()
+            get_man.process_package(pkg)
+            return time.monotonic() - pkg_start
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            latencies = list(executor.map(timed, listed))
+
+        elapsed = time.monotonic() - start
+
+    return {
+        "packages": len(listed),
+        "processed": len(get_man.processed_set),
+        "pages": sum(1 for _ in destdir.rglob("*.txt")),
+        "seconds": elapsed,
+        "throughput": len(listed) / elapsed,
+        "latency": summarize(latencies),
+    }
+
+
+BENCHMARKS = {
+    "generator": bench_generator,
+    "solver": bench_solver,
+    "converter": bench_converter,
+    "get_man": bench_get_man,
+}
+
+
+def run(names=None):
+    """
+    Run the named benchmarks (all by default), each in its own scratch
+    directory, and return their reports by name.
+    """
+    reports = {}
+    for name in names or BENCHMARKS:
+        with tempfile.TemporaryDirectory() as tmp:
+            reports[name] = BENCHMARKS[name](Path(tmp))
+    return reports
+
+
+def regressions(reports, baseline, tolerance: float = TOLERANCE):
+    """
+    Compare against a baseline report: a lower throughput or a higher p90
+    latency than the baseline by more than `tolerance` is a regression.
+    """
+    found = []
+    for name, report in reports.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+
+        if report["throughput"] < base["throughput"] * (1 - tolerance):
+            found.append(
+                f"{name}: throughput {report['throughput']:.2f}/s, "
+                f"baseline {base['throughput']:.2f}/s"
+            )
+
+        latency, base_latency = report.get("latency"), base.get("latency")
+        if latency and base_latency and \
+                latency["p90"] > base_latency["p90"] * (1 + tolerance):
+            found.append(
+                f"{name}: p90 latency {latency['p90']:.3f}s, "
+                f"baseline {base_latency['p90']:.3f}s"
+            )
+    return found
+
+
+def print_report(reports):
+    for name, report in reports.items():
+        print(f"{name}: {report['throughput']:.2f}/s "
+              f"in {report['seconds']:.2f}s")
+        for label, key in (("latency", "latency"), ("llm calls", "llm")):
+            stats = report.get(key)
+            if key == "llm" and stats:
+                stats = stats["latency"]
+            if stats:
+                print(f"  {label}: p50 {stats['p50']:.3f}s "
+                      f"p90 {stats['p90']:.3f}s p99 {stats['p99']:.3f}s")
+        for stage, stats in report.get("stages", {}).items():
+            print(f"  {stage}: p50 {stats['p50']:.3f}s "
+                  f"p90 {stats['p90']:.3f}s p99 {stats['p99']:.3f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Offline benchmarks with a fake LLM, sandbox and mirror"
+    )
+    parser.add_argument(
+        "names", nargs="*", help=f"any of {', '.join(BENCHMARKS)}"
+    )
+    parser.add_argument("--baseline", help="compare against this report")
+    parser.add_argument("--save", help="write the report here")
+    args = parser.parse_args()
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    reports = run(args.names)
+    print_report(reports)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(reports, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(reports, json.load(f))
+        for line in found:
+            print("REGRESSION", line)
+        if found:
+            raise SystemExit(1)
@@ -0,0 +1,189 @@
+import json
+import asyncio
+from typing import Dict, Any, Optional
+
+from nash.clients.key_rotate import APIKeyRotator, shared_rotator
+from nash.clients.cache import ResponseCache
+from nash.clients.json_client import (
+    estimate_tokens,
+    parse_reply,
+    request_fields,
+)
+
+
+class AsyncJSONClient:
+    """
+    asyncio counterpart of JSONClient, with one AsyncGroq client per key
+    and up to `max_concurrency` requests in flight.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        system_prompt: str,
+        json_schema: Dict[str, Any],
+        top_p: float = 0.9,
+        temperature: float = 0.7,
+        max_tokens: Optional[int] = None,
+        max_concurrency: int = 16,
+        cache: Optional[ResponseCache] = None,
+        keys: Optional[APIKeyRotator] = None,
+    ):
+        self.model_name = model_name
+        self.system_prompt = system_prompt
+        self.json_schema = json_schema
+        self.top_p = top_p
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.cache = cache
+
+        # Imported here, like in JSONClient
+        from nash.env import GROQ_KEYS
+
+        self.keys = keys or shared_rotator(GROQ_KEYS)
+        self.clients = {}
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.history = []
+        self.reset()
+
+    def reset(self):
+        self.history = [
+            {"role": "system", "content": self.system_prompt}
+        ]
+
+    def client(self, key: str):
+        from groq import AsyncGroq
+
+        if key not in self.clients:
+            self.clients[key] = AsyncGroq(api_key=key)
+        return self.clients[key]
+
+    async def _request(self, messages, sample: Optional[int] = None):
+        if self.cache is None:
+            return self._parse(await self._complete(messages))
+
+        return await self.cache.alookup(
+            request_fields(self, messages, sample),
+            lambda: self._complete(messages),
+            parse=self._parse,
+        )
+
+    def _parse(self, content: str) -> Dict[str, Any]:
+        return parse_reply(content, self.json_schema)
+
+    async def _complete(self, messages) -> str:
+        from groq import APIStatusError
+
+        async with self.semaphore:
+            key = await self.keys.aget_key(
+                estimate_tokens(messages, self.max_tokens)
+            )
+            client = self.client(key)
+            try:
+                raw = await client.chat.completions.with_raw_response.create(
+                    model=self.model_name,
+                    messages=messages,
+                    max_tokens=self.max_tokens,
+                    top_p=self.top_p,
+                    temperature=self.temperature,
+                    response_format={
+                        "type": "json_schema",
+                        "json_schema": self.json_schema
+                    }
+                )
+            except APIStatusError as err:
+                self.keys.update(key, err.response.headers)
+                raise
+
+        self.keys.update(key, raw.headers)
+        response = raw.parse()
+        return response.choices[0].message.content or "{}"
+
+    async def generate_once(
+        self, input_text: str, sample: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        One-shot structured generation (does not update history)
+        """
+        messages = self.history + [{"role": "user", "content": input_text}]
+
+        return await self._request(messages, sample)
+
+    async def generate(self, input_text: str) -> Dict[str, Any]:
+        """
+        Conversational structured generation (updates history)
+        """
+        user_message = {"role": "user", "content": input_text}
+        self.history.append(user_message)
+
+        structured_output = await self._request(self.history)
+
+        assistant_message = {
+            "role": "assistant",
+            "content": structured_output
+        }
+
+        self.history.append(assistant_message)
+
+        return structured_output
+
+    async def generate_many(
+        self, inputs, return_exceptions: bool = False
+    ):
+        """
+        generate_once over every input concurrently, results in input
+        order. With `return_exceptions`, a failed request yields its
+        exception instead of cancelling the rest.
+        """
+        return await asyncio.gather(
+            *(self.generate_once(text) for text in inputs),
+            return_exceptions=return_exceptions,
+        )
+
+    async def close(self):
+        for client in self.clients.values():
+            await client.close()
+        self.clients = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+if __name__ == "__main__":
+    json_schema = {
+        "name": "question_answer",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "title": {"type": "string"},
+                "answer": {"type": "string"}
+            },
+            "required": [
+                "title",
+                "answer"
+            ],
+            "additionalProperties": False
+        }
+    }
+
+    async def main():
+        async with AsyncJSONClient(
+            model_name="openai/gpt-oss-120b",
+            system_prompt="Answer the following questions.",
+            json_schema=json_schema
+        ) as client:
+            results = await client.generate_many(
+                [
+                    "What is the capital of France?",
+                    "What does `ls -a` list?",
+                    "Which signal does `kill` send by default?",
+                ]
+            )
+        for result in results:
+            print(json.dumps(result, indent=2))
+
+    asyncio.run(main())
@@ -0,0 +1,176 @@
+import os
+import json
+import asyncio
+import hashlib
+import tempfile
+import threading
+
+
+MODES = ("readwrite", "replay", "bypass")
+
+# Eviction frees space down to this fraction of max_bytes, so it doesn't
+# have to rescan the cache on every write once it is full
+LOW_WATER = 0.8
+
+
+class CacheMiss(KeyError):
+    pass
+
+
+def request_key(**fields) -> str:
+    """
+    Content address of a request: sha256 of its canonical JSON.
+    """
+    blob = json.dumps(
+        fields, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    On-disk LLM response cache, one file per request under `path`,
+    addressed by request_key of everything that shapes the answer.
+
+    Modes:
+      readwrite  serve hits, store misses
+      replay     serve hits, raise CacheMiss on a miss (no API calls)
+      bypass     neither read nor write
+
+    Hits refresh an entry's mtime; once the cache grows past `max_bytes`
+    the least recently used entries are deleted. One instance can be
+    shared by any number of threads and clients.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        mode: str = "readwrite",
+        max_bytes: int = 1 << 30,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+
+        self.path = path
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(self.path, exist_ok=True)
+        self.size = sum(size for _, _, size in self.entries())
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.path, key[:2], key + ".json")
+
+    def entries(self):
+        for shard in os.scandir(self.path):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime_ns, entry.path, stat.st_size
+
+    def get(self, key: str):
+        """
+        The cached response for `key`, or None on a miss (CacheMiss in
+        replay mode).
+        """
+        if self.mode == "bypass":
+            return None
+
+        path = self.entry_path(key)
+        try:
+            with open(path) as f:
+                response = json.load(f)["response"]
+            os.utime(path)
+        except (FileNotFoundError, ValueError, KeyError):
+            with self.lock:
+                self.misses += 1
+            if self.mode == "replay":
+                raise CacheMiss(key)
+            return None
+
+        with self.lock:
+            self.hits += 1
+        return response
+
+    def put(self, key: str, response):
+        if self.mode != "readwrite":
+            return
+
+        path = self.entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps({"response": response}).encode()
+
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+
+        with self.lock:
+            try:
+                self.size -= os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+            os.replace(tmp, path)
+            self.size += len(data)
+            if self.size > self.max_bytes:
+                self.evict()
+
+    def evict(self):
+        target = self.max_bytes * LOW_WATER
+        for _, path, size in sorted(self.entries()):
+            if self.size <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self.size -= size
+
+    def lookup(self, fields: dict, request, parse=None):
+        """
+        Serve `fields` from the cache, or call `request()` and store it.
+        With `parse`, returns parse(response); what it rejects with
+        ValueError is neither stored nor served.
+        """
+        key = request_key(**fields)
+        hit, result = self._cached(key, parse)
+        if hit:
+            return result
+        return self._store(key, request(), parse)
+
+    async def alookup(self, fields: dict, request, parse=None):
+        """
+        lookup for a coroutine function `request`, file I/O off the loop.
+        """
+        key = request_key(**fields)
+        hit, result = await asyncio.to_thread(self._cached, key, parse)
+        if hit:
+            return result
+        response = await request()
+        return await asyncio.to_thread(self._store, key, response, parse)
+
+    def _cached(self, key: str, parse):
+        response = self.get(key)
+        if response is None:
+            return False, None
+        if parse is None:
+            return True, response
+        try:
+            return True, parse(response)
+        except ValueError:
+            if self.mode == "replay":
+                raise CacheMiss(key)
+            return False, None
+
+    def _store(self, key: str, response, parse):
+        result = response if parse is None else parse(response)
+        self.put(key, response)
+        return result
@@ -1,5 +1,6 @@
 from groq import Groq
 from nash.env import GROQ_API_KEY
+from nash.clients.cache import ResponseCache
 
 
 class CloudClient:
@@ -10,12 +11,14 @@ class CloudClient:
     top_p: float = 0.9,
     temperature: float = 0.7,
     max_tokens: int = None,
+    cache: ResponseCache = None,
   ):
     self.model_name = model_name
     self.system_prompt = system_prompt
     self.top_p = top_p
     self.temperature = temperature
     self.max_tokens = max_tokens
+    self.cache = cache
 
     self.client = Groq(api_key=GROQ_API_KEY)
     self.history = list()
@@ -26,7 +29,21 @@ class CloudClient:
       {"role": "system","content": self.system_prompt}
     ]
 
-  def _request(self, messages):
+  def _request(self, messages, sample: int = None):
+    if self.cache is None:
+      return self._complete(messages)
+
+    fields = {
+      "model": self.model_name,
+      "messages": messages,
+      "top_p": self.top_p,
+      "temperature": self.temperature,
+      "max_tokens": self.max_tokens,
+      "sample": sample,
+    }
+    return self.cache.lookup(fields, lambda: self._complete(messages))
+
+  def _complete(self, messages):
     response = self.client.chat.completions.create(
       model = self.model_name,
       messages = messages,
@@ -37,13 +54,13 @@ class CloudClient:
 
     return response.choices[0].message.content
 
-  def generate_once(self, input):
+  def generate_once(self, input, sample: int = None):
     """
     One-shot generation (does not update history)
     """
     messages = self.history + [{"role": "user", "content": input}]
     
-    return self._request(messages)
+    return self._request(messages, sample)
 
   def generate(self, input: str):
     """
@@ -0,0 +1,396 @@
+import json
+import string
+
+import torch
+from transformers import LogitsProcessor, StoppingCriteria
+
+
+HEX_DIGITS = set(string.hexdigits)
+ESCAPES = set('"\\/bfnrt')
+# Characters that end a JSON string or start an escape inside one
+STRING_SPECIAL = '"\\'
+# Longest integer literal we let the model write
+MAX_DIGITS = 18
+
+
+def unwrap_schema(schema):
+    """
+    Accept both a bare JSON schema and the {"name", "strict", "schema"}
+    wrapper used for response_format in nash.generation.prompts.
+    """
+    if "type" not in schema and "schema" in schema:
+        return schema["schema"]
+    return schema
+
+
+class SchemaGrammar:
+    """
+    The JSON documents a schema allows, as an automaton over characters,
+    mapped onto a tokenizer's vocabulary.
+
+    Documents are canonical: no whitespace outside strings and every
+    object property present, in schema order. Supported types are object,
+    array, string, integer (with minimum/maximum), number (as integer),
+    boolean, null and enum.
+
+    The automaton is an NFA whose state is a frozenset of (node, sub)
+    pairs; `sub` is the escape state inside a string or the digits so far
+    of an integer. Allowed token ids are computed once per state and
+    memoized. States inside a string share a precomputed set of tokens
+    that can't leave the string, so only tokens with a quote or backslash
+    are simulated there.
+    """
+
+    def __init__(self, tokenizer, schema, eos_token_id=None):
+        self.nodes = []
+        self.end = self._node("end")
+        root = self._compile(unwrap_schema(schema), self.end)
+        self.start = self._enter(root)
+
+        if eos_token_id is None:
+            eos_token_id = tokenizer.eos_token_id
+        if isinstance(eos_token_id, int):
+            eos_token_id = [eos_token_id]
+        self.eos_ids = list(eos_token_id)
+
+        self.step_memo = {}
+        self.allowed_memo = {}
+        self.mask_memo = {}
+        self._index_vocab(tokenizer)
+
+    # Schema compilation
+
+    def _node(self, kind, **fields):
+        self.nodes.append(dict(kind=kind, **fields))
+        return len(self.nodes) - 1
+
+    def _literal(self, text, next_node):
+        node = next_node
+        for char in reversed(text):
+            node = self._node("lit", edges={char: node})
+        return node
+
+    def _compile(self, schema, next_node):
+        """
+        Entry node of the values `schema` allows, followed by next_node.
+        """
+        if "enum" in schema:
+            return self._node(
+                "alt",
+                options=[
+                    self._literal(json.dumps(value), next_node)
+                    for value in schema["enum"]
+                ],
+            )
+
+        kind = schema.get("type")
+        if kind == "object":
+            properties = list(schema.get("properties", {}).items())
+            if not properties:
+                return self._literal("{}", next_node)
+            node = self._literal("}", next_node)
+            for index in range(len(properties) - 1, -1, -1):
+                name, prop = properties[index]
+                node = self._compile(prop, node)
+                key = ("{" if index == 0 else ",") + json.dumps(name) + ":"
+                node = self._literal(key, node)
+            return node
+
+        if kind == "array":
+            after_item = self._node("lit", edges={"]": next_node})
+            item = self._compile(schema.get("items", {}), after_item)
+            self.nodes[after_item]["edges"][","] = item
+            first = item
+            if not schema.get("minItems"):
+                first = self._node(
+                    "alt", options=[item, self._literal("]", next_node)]
+                )
+            return self._literal("[", first)
+
+        if kind == "string":
+            return self._literal('"', self._node("str", next=next_node))
+
+        if kind in ("integer", "number"):
+            return self._node(
+                "int",
+                next=next_node,
+                min=schema.get("minimum"),
+                max=schema.get("maximum"),
+            )
+
+        if kind == "boolean":
+            return self._node(
+                "alt",
+                options=[
+                    self._literal("true", next_node),
+                    self._literal("false", next_node),
+                ],
+            )
+
+        if kind == "null":
+            return self._literal("null", next_node)
+
+        raise ValueError(f"unsupported schema: {schema}")
+
+    # Automaton
+
+    def _enter(self, node):
+        """
+        States reached on entering `node`, through alternatives.
+        """
+        spec = self.nodes[node]
+        if spec["kind"] == "alt":
+            states = set()
+            for option in spec["options"]:
+                states |= self._enter(option)
+            return frozenset(states)
+        if spec["kind"] == "str":
+            return frozenset([(node, 0)])
+        if spec["kind"] == "int":
+            return frozenset([(node, "")])
+        return frozenset([(node, None)])
+
+    def _int_prefix_ok(self, spec, digits):
+        """
+        Whether some integer in the schema's range starts with `digits`.
+        """
+        low = spec["min"] if spec["min"] is not None else -float("inf")
+        high = spec["max"] if spec["max"] is not None else float("inf")
+        negative = digits.startswith("-")
+        body = digits.lstrip("-")
+
+        if not body:
+            return low <= -1 if negative else high >= 0
+        if len(body) > MAX_DIGITS or (body[0] == "0" and len(body) > 1):
+            return False
+        if body == "0":
+            return not negative and low <= 0 <= high
+
+        value = int(body)
+        for extra in range(MAX_DIGITS - len(body) + 1):
+            first = value * 10 ** extra
+            last = (value + 1) * 10 ** extra - 1
+            if negative:
+                first, last = -last, -first
+            if first <= high and last >= low:
+                return True
+        return False
+
+    def _int_complete(self, spec, digits):
+        if digits in ("", "-"):
+            return False
+        value = int(digits)
+        if spec["min"] is not None and value < spec["min"]:
+            return False
+        if spec["max"] is not None and value > spec["max"]:
+            return False
+        return True
+
+    def _step_one(self, state, char):
+        node, sub = state
+        spec = self.nodes[node]
+        kind = spec["kind"]
+
+        if kind == "lit":
+            target = spec["edges"].get(char)
+            return self._enter(target) if target is not None else frozenset()
+
+        if kind == "str":
+            if sub == 0:
+                if char == '"':
+                    return self._enter(spec["next"])
+                if char == "\\":
+                    return frozenset([(node, -1)])
+                if ord(char) < 0x20:
+                    return frozenset()
+                return frozenset([state])
+            if sub == -1:
+                if char in ESCAPES:
+                    return frozenset([(node, 0)])
+                if char == "u":
+                    return frozenset([(node, 4)])
+                return frozenset()
+            if char in HEX_DIGITS:
+                return frozenset([(node, sub - 1)])
+            return frozenset()
+
+        if kind == "int":
+            states = set()
+            if char.isdigit() and char.isascii():
+                if self._int_prefix_ok(spec, sub + char):
+                    states.add((node, sub + char))
+            elif char == "-" and sub == "":
+                if self._int_prefix_ok(spec, "-"):
+                    states.add((node, "-"))
+            if self._int_complete(spec, sub):
+                states |= self.step(self._enter(spec["next"]), char)
+            return frozenset(states)
+
+        return frozenset()
+
+    def step(self, states, char):
+        key = (states, char)
+        result = self.step_memo.get(key)
+        if result is None:
+            result = set()
+            for state in states:
+                result |= self._step_one(state, char)
+            result = frozenset(result)
+            self.step_memo[key] = result
+        return result
+
+    def consume(self, states, text):
+        for char in text:
+            states = self.step(states, char)
+            if not states:
+                break
+        return states
+
+    def is_final(self, states) -> bool:
+        return any(node == self.end for node, _ in states)
+
+    def in_string(self, states) -> bool:
+        return all(
+            self.nodes[node]["kind"] == "str" and sub == 0
+            for node, sub in states
+        )
+
+    # Vocabulary
+
+    def _index_vocab(self, tokenizer):
+        """
+        Text of every token, tokens grouped by first character, and the
+        tokens that are safe anywhere inside a string.
+        """
+        special = set(tokenizer.all_special_ids)
+        special |= set(getattr(tokenizer, "added_tokens_decoder", {}))
+
+        self.texts = {}
+        self.by_first = {}
+        safe, self.string_special = [], []
+
+        for token_id in range(len(tokenizer)):
+            if token_id in special:
+                continue
+            text = tokenizer.decode([token_id])
+            piece = tokenizer.convert_ids_to_tokens(token_id) or ""
+            # SentencePiece drops the word boundary marker when a token is
+            # decoded on its own
+            if piece.startswith("▁") and not text.startswith(" "):
+                text = " " + text
+            # Empty or partial UTF-8 tokens can't be checked char by char
+            if not text or "�" in text:
+                continue
+
+            self.texts[token_id] = text
+            self.by_first.setdefault(text[0], []).append(token_id)
+            if any(char in STRING_SPECIAL for char in text):
+                self.string_special.append(token_id)
+            elif all(ord(char) >= 0x20 for char in text):
+                safe.append(token_id)
+
+        self.string_safe = safe
+
+    def advance(self, states, token_id: int):
+        if token_id in self.eos_ids:
+            return states
+        text = self.texts.get(token_id)
+        if text is None:
+            return frozenset()
+        return self.consume(states, text)
+
+    def allowed(self, states):
+        """
+        Token ids that keep the document valid from `states`.
+        """
+        result = self.allowed_memo.get(states)
+        if result is not None:
+            return result
+
+        if self.in_string(states):
+            allowed = list(self.string_safe)
+            candidates = self.string_special
+        else:
+            allowed = []
+            candidates = [
+                token_id
+                for char, ids in self.by_first.items()
+                if self.step(states, char)
+                for token_id in ids
+            ]
+
+        for token_id in candidates:
+            if self.consume(states, self.texts[token_id]):
+                allowed.append(token_id)
+
+        # Nothing can follow a finished document (or a dead end) but EOS
+        if self.is_final(states) or not states:
+            allowed = list(self.eos_ids)
+
+        self.allowed_memo[states] = allowed
+        return allowed
+
+    def mask(self, states, size: int, device):
+        """
+        Boolean mask over a `size` logits vector, True where allowed.
+        """
+        key = (states, size, str(device))
+        mask = self.mask_memo.get(key)
+        if mask is None:
+            mask = torch.zeros(size, dtype=torch.bool, device=device)
+            allowed = [i for i in self.allowed(states) if i < size]
+            mask[torch.tensor(allowed, dtype=torch.long, device=device)] = True
+            self.mask_memo[key] = mask
+        return mask
+
+
+class SchemaLogitsProcessor(LogitsProcessor):
+    """
+    Masks every token that would break the schema, one automaton state
+    per batch row. Use a fresh one for every generate call.
+    """
+
+    def __init__(self, grammar: SchemaGrammar):
+        self.grammar = grammar
+        self.states = None
+        self.seen = 0
+
+    def advance(self, input_ids):
+        if self.states is None:
+            self.states = [self.grammar.start] * input_ids.shape[0]
+            self.seen = input_ids.shape[1]
+
+        for position in range(self.seen, input_ids.shape[1]):
+            for row, states in enumerate(self.states):
+                # Rows already done only get padding from here on
+                if self.grammar.is_final(states):
+                    continue
+                self.states[row] = self.grammar.advance(
+                    states, int(input_ids[row, position])
+                )
+        self.seen = input_ids.shape[1]
+
+    def __call__(self, input_ids, scores):
+        self.advance(input_ids)
+        for row, states in enumerate(self.states):
+            mask = self.grammar.mask(states, scores.shape[-1], scores.device)
+            scores[row] = scores[row].masked_fill(~mask, -float("inf"))
+        return scores
+
+
+class SchemaStoppingCriteria(StoppingCriteria):
+    """
+    Stops a row as soon as its document closes, without waiting for EOS.
+    """
+
+    def __init__(self, processor: SchemaLogitsProcessor):
+        self.processor = processor
+
+    def __call__(self, input_ids, scores, **kwargs):
+        self.processor.advance(input_ids)
+        grammar = self.processor.grammar
+        return torch.tensor(
+            [grammar.is_final(states) for states in self.processor.states],
+            dtype=torch.bool,
+            device=input_ids.device,
+        )
@@ -1,8 +1,50 @@
 import json
-from groq import Groq
 from typing import Dict, Any, Optional
 
-from nash.env import GROQ_KEYS, APIKeyRotator
+from nash.clients.key_rotate import APIKeyRotator, shared_rotator
+from nash.clients.cache import ResponseCache
+
+
+def estimate_tokens(messages, max_tokens: Optional[int] = None) -> int:
+    """
+    Rough token cost of a request (4 chars per token), for rate limiting.
+    """
+    chars = sum(len(str(message["content"])) for message in messages)
+    return chars // 4 + (max_tokens or 0)
+
+
+def parse_reply(content: str, json_schema: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Decode a structured reply, raising ValueError if it isn't JSON or
+    lacks a property the schema requires (e.g. a truncated reply).
+    """
+    output = json.loads(content)
+    schema = json_schema.get("schema", json_schema)
+    if schema.get("type") == "object":
+        if not isinstance(output, dict):
+            raise ValueError(f"expected a JSON object, got: {content[:200]}")
+        missing = [
+            name for name in schema.get("required", []) if name not in output
+        ]
+        if missing:
+            raise ValueError(f"reply lacks {', '.join(missing)}")
+    return output
+
+
+def request_fields(client, messages, sample=None) -> Dict[str, Any]:
+    """
+    What keys a reply in the response cache; `sample` tells apart repeated
+    draws for the same messages.
+    """
+    return {
+        "model": client.model_name,
+        "messages": messages,
+        "json_schema": client.json_schema,
+        "top_p": client.top_p,
+        "temperature": client.temperature,
+        "max_tokens": client.max_tokens,
+        "sample": sample,
+    }
 
 
 class JSONClient:
@@ -14,6 +56,8 @@ class JSONClient:
         top_p: float = 0.9,
         temperature: float = 0.7,
         max_tokens: Optional[int] = None,
+        cache: Optional[ResponseCache] = None,
+        keys: Optional[APIKeyRotator] = None,
     ):
         self.model_name = model_name
         self.system_prompt = system_prompt
@@ -21,8 +65,14 @@ class JSONClient:
         self.top_p = top_p
         self.temperature = temperature
         self.max_tokens = max_tokens
+        self.cache = cache
+
+        # Imported here so that importing this module (for the default
+        # client_factory of Generator & co.) needs neither groq nor keys
+        from groq import Groq
+        from nash.env import GROQ_KEYS
 
-        self.keys = APIKeyRotator(GROQ_KEYS)
+        self.keys = keys or shared_rotator(GROQ_KEYS)
         self.client = Groq(api_key="LetsSeeWhatHappens")
         self.history = []
         self.reset()
@@ -32,31 +82,54 @@ class JSONClient:
             {"role": "system", "content": self.system_prompt}
         ]
 
-    def _request(self, messages):
-        self.client.api_key = self.keys.get_key()
-
-        response = self.client.chat.completions.create(
-            model=self.model_name,
-            messages=messages,
-            max_tokens=self.max_tokens,
-            top_p=self.top_p,
-            temperature=self.temperature,
-            response_format={
-                "type": "json_schema",
-                "json_schema": self.json_schema
-            }
-        )
+    def _request(self, messages, sample: Optional[int] = None):
+        if self.cache is None:
+            return self._parse(self._complete(messages))
 
-        content = response.choices[0].message.content or "{}"
-        return json.loads(content)
+        return self.cache.lookup(
+            request_fields(self, messages, sample),
+            lambda: self._complete(messages),
+            parse=self._parse,
+        )
 
-    def generate_once(self, input_text: str) -> Dict[str, Any]:
+    def _parse(self, content: str) -> Dict[str, Any]:
+        return parse_reply(content, self.json_schema)
+
+    def _complete(self, messages) -> str:
+        from groq import APIStatusError
+
+        key = self.keys.get_key(estimate_tokens(messages, self.max_tokens))
+        self.client.api_key = key
+
+        try:
+            raw = self.client.chat.completions.with_raw_response.create(
+                model=self.model_name,
+                messages=messages,
+                max_tokens=self.max_tokens,
+                top_p=self.top_p,
+                temperature=self.temperature,
+                response_format={
+                    "type": "json_schema",
+                    "json_schema": self.json_schema
+                }
+            )
+        except APIStatusError as err:
+            self.keys.update(key, err.response.headers)
+            raise
+
+        self.keys.update(key, raw.headers)
+        response = raw.parse()
+        return response.choices[0].message.content or "{}"
+
+    def generate_once(
+        self, input_text: str, sample: Optional[int] = None
+    ) -> Dict[str, Any]:
         """
         One-shot structured generation (does not update history)
         """
         messages = self.history + [{"role": "user", "content": input_text}]
 
-        return self._request(messages)
+        return self._request(messages, sample)
 
     def generate(self, input_text: str) -> Dict[str, Any]:
         """
@@ -0,0 +1,257 @@
+import re
+import time
+import asyncio
+import threading
+
+
+# Groq reports reset times as durations like "2m59.56s", "7.66s", "120ms"
+DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+def parse_duration(value) -> float:
+    """
+    Seconds in a rate-limit reset header, None if it can't be read.
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PATTERN.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * UNITS[unit] for amount, unit in parts)
+
+
+class NoKeyAvailable(RuntimeError):
+    pass
+
+
+def header_int(headers, name: str):
+    try:
+        return int(float(headers.get(name)))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    `capacity` units per `window` seconds, refilling at `rate` per second
+    (capacity / window unless given). Unlimited when capacity is None.
+    """
+
+    def __init__(self, capacity=None, rate=None, window: float = 60.0):
+        self.capacity = capacity
+        self.window = window
+        self.rate = rate
+        if rate is None and capacity:
+            self.rate = capacity / window
+        self.level = capacity
+        self.stamp = time.monotonic()
+
+    def refill(self, now: float):
+        if self.capacity is None:
+            return
+        if self.rate:
+            self.level = min(
+                self.capacity, self.level + (now - self.stamp) * self.rate
+            )
+        self.stamp = now
+
+    def ready_at(self, amount: float, now: float) -> float:
+        """
+        When `amount` units will be available (now or later).
+        """
+        if self.capacity is None:
+            return now
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return now
+        if not self.rate:
+            return float("inf")
+        return now + (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        if self.capacity is not None:
+            self.level -= min(amount, self.capacity)
+
+    def sync(self, limit, remaining, reset):
+        """
+        Adopt the server's view: `remaining` of `limit` left, back to full
+        in `reset` seconds. The headers must be for this bucket's window.
+        """
+        if limit:
+            self.capacity = limit
+            if self.level is None:
+                self.level = limit
+        if remaining is None or self.capacity is None:
+            return
+        self.level = min(remaining, self.capacity)
+        self.stamp = time.monotonic()
+        if reset and self.capacity > remaining:
+            self.rate = (self.capacity - remaining) / reset
+        elif not self.rate:
+            self.rate = self.capacity / self.window
+
+
+class KeyState:
+    def __init__(self, key: str, requests_per_minute, tokens_per_minute):
+        self.key = key
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.blocked_until = 0.0
+
+    def ready_at(self, tokens: float, now: float) -> float:
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        return max(
+            self.blocked_until,
+            self.requests.ready_at(1, now),
+            self.tokens.ready_at(tokens, now),
+        )
+
+
+class APIKeyRotator:
+    """
+    Hands out whichever API key can take a request soonest.
+
+    Each key has a per-minute requests and tokens bucket, seeded from
+    `requests_per_minute` / `tokens_per_minute` (None for no limit). The
+    tokens bucket is corrected from the x-ratelimit-*-tokens headers of
+    every response passed to `update`. The *-requests headers are for a
+    day on Groq, so they only bench a key that has none left until their
+    reset, as does a Retry-After. get_key blocks the calling thread until
+    some key has room, raising NoKeyAvailable if none ever will; aget_key
+    is the asyncio version. Both share one lock never held while waiting.
+    """
+
+    def __init__(
+        self,
+        keys,
+        requests_per_minute: int = 30,
+        tokens_per_minute: int = None,
+    ):
+        if not keys:
+            raise ValueError("no API keys given")
+        self.states = {
+            key: KeyState(key, requests_per_minute, tokens_per_minute)
+            for key in keys
+        }
+        self.order = list(self.states)
+        self.next_index = 0
+        self.lock = threading.Lock()
+
+    def _reserve(self, tokens: float):
+        """
+        (key, 0) with the key's budget taken if one is ready now,
+        otherwise (None, seconds until the first one is).
+        """
+        with self.lock:
+            now = time.monotonic()
+            best, best_time = None, float("inf")
+            # Start after the last key handed out, so ties rotate
+            for offset in range(len(self.order)):
+                index = (self.next_index + offset) % len(self.order)
+                state = self.states[self.order[index]]
+                ready = state.ready_at(tokens, now)
+                if ready < best_time:
+                    best, best_time = index, ready
+
+            if best_time > now:
+                return None, best_time - now
+
+            state = self.states[self.order[best]]
+            state.requests.take(1)
+            state.tokens.take(tokens)
+            self.next_index = best + 1
+            return state.key, 0.0
+
+    def get_key(self, tokens: float = 0) -> str:
+        """
+        A key with room for one request of about `tokens` tokens, waiting
+        for one if all are exhausted.
+        """
+        while True:
+            key, wait = self._reserve(tokens)
+            if key is not None:
+                return key
+            self._check_wait(wait, tokens)
+            time.sleep(min(wait, 60))
+
+    async def aget_key(self, tokens: float = 0) -> str:
+        while True:
+            key, wait = self._reserve(tokens)
+            if key is not None:
+                return key
+            self._check_wait(wait, tokens)
+            await asyncio.sleep(min(wait, 60))
+
+    def _check_wait(self, wait: float, tokens: float):
+        if wait == float("inf"):
+            raise NoKeyAvailable(
+                f"no API key can ever take a request of {tokens} tokens"
+            )
+
+    def update(self, key: str, headers):
+        """
+        Take in the rate-limit headers of a response (or error) for `key`.
+        """
+        if headers is None:
+            return
+        state = self.states.get(key)
+        if state is None:
+            return
+
+        with self.lock:
+            # Requests per day: out of them, the key sits out the reset
+            if header_int(headers, "x-ratelimit-remaining-requests") == 0:
+                reset = parse_duration(
+                    headers.get("x-ratelimit-reset-requests")
+                )
+                self._block(state, reset or state.requests.window)
+            state.tokens.sync(
+                header_int(headers, "x-ratelimit-limit-tokens"),
+                header_int(headers, "x-ratelimit-remaining-tokens"),
+                parse_duration(headers.get("x-ratelimit-reset-tokens")),
+            )
+
+            retry_after = parse_duration(headers.get("retry-after"))
+            if retry_after:
+                self._block(state, retry_after)
+
+    def penalize(self, key: str, seconds: float):
+        """
+        Bench `key` for `seconds`, e.g. after a 429 without headers.
+        """
+        state = self.states.get(key)
+        if state is None:
+            return
+        with self.lock:
+            self._block(state, seconds)
+
+    def _block(self, state: KeyState, seconds: float):
+        state.blocked_until = max(
+            state.blocked_until, time.monotonic() + seconds
+        )
+
+
+# One rotator per key set, so every client in the process draws on the
+# same budgets
+ROTATORS = {}
+ROTATORS_LOCK = threading.Lock()
+
+
+def shared_rotator(keys, **limits) -> APIKeyRotator:
+    """
+    The process-wide APIKeyRotator for `keys`, so that clients share one
+    budget, created on first use with `limits` (later ones are ignored).
+    """
+    with ROTATORS_LOCK:
+        rotator = ROTATORS.get(tuple(keys))
+        if rotator is None:
+            rotator = APIKeyRotator(keys, **limits)
+            ROTATORS[tuple(keys)] = rotator
+        return rotator
@@ -1,6 +1,50 @@
 import json
 import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
+from transformers import (
+  AutoTokenizer,
+  AutoModelForCausalLM,
+  DynamicCache,
+  LogitsProcessorList,
+  StoppingCriteriaList,
+  TemperatureLogitsWarper,
+  TopKLogitsWarper,
+  TopPLogitsWarper,
+)
+
+from nash.clients.constrained import (
+  SchemaGrammar,
+  SchemaLogitsProcessor,
+  SchemaStoppingCriteria,
+)
+
+
+DTYPES = {
+  "float16": torch.float16,
+  "bfloat16": torch.bfloat16,
+  "float32": torch.float32,
+}
+
+
+def cpu_bf16_supported() -> bool:
+  try:
+    return torch.ops.mkldnn._is_mkldnn_bf16_supported()
+  except (AttributeError, RuntimeError):
+    return False
+
+
+def pick_dtype(device: torch.device, dtype: str = None, quantize=False):
+  """
+  float16 stays the default on accelerators. On CPU fp16 matmuls are slow
+  or missing, so the default there is bfloat16 where oneDNN supports it
+  and float32 otherwise. Dynamic int8 quantization needs float32 weights.
+  """
+  if quantize:
+    return torch.float32
+  if dtype is not None:
+    return DTYPES[dtype]
+  if device.type != "cpu":
+    return torch.float16
+  return torch.bfloat16 if cpu_bf16_supported() else torch.float32
 
 
 class LocalClient:
@@ -12,6 +56,13 @@ class LocalClient:
     top_p: float = 0.9,
     temperature: float = 0.7,
     max_tokens: int = 1000,
+    batch_tokens: int = 16384,
+    prefix_cache: bool = True,
+    json_schema: dict = None,
+    dtype: str = None,
+    quantize: bool = False,
+    num_threads: int = None,
+    compile: bool = False,
   ):
     self.model_name = model_name
     self.device_name = device_name
@@ -19,12 +70,51 @@ class LocalClient:
     self.top_p = top_p
     self.temperature = temperature
     self.max_tokens = max_tokens
+    # Prompt plus new tokens, summed over a batch, that one generate call
+    # may hold; bounds the KV cache and activations of a batch
+    self.batch_tokens = batch_tokens
+    self.prefix_cache = prefix_cache
+    # Key/values of the last request and the token ids they cover; the
+    # next request only prefills what comes after their common prefix
+    self.kv_cache = None
+    self.kv_ids = None
 
     self.device = torch.device(self.device_name)
+    if quantize and self.device.type != "cpu":
+      raise ValueError("dynamic int8 quantization only runs on CPU")
+    if num_threads:
+      # Process wide: intra-op threads for every model in this process
+      torch.set_num_threads(num_threads)
+    self.dtype = pick_dtype(self.device, dtype, quantize)
+
     self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+    # Batched prompts are left padded so every row ends where generation
+    # starts
+    self.tokenizer.padding_side = "left"
+    if self.tokenizer.pad_token is None:
+      self.tokenizer.pad_token = self.tokenizer.eos_token
     self.client = AutoModelForCausalLM.from_pretrained(
-      model_name, dtype=torch.float16
+      model_name, dtype=self.dtype
     ).to(self.device)
+    self.client.eval()
+    if quantize:
+      # int8 weights for every Linear, activations quantized on the fly
+      self.client = torch.ao.quantization.quantize_dynamic(
+        self.client, {torch.nn.Linear}, dtype=torch.qint8
+      )
+    if compile:
+      # Shapes change every step as the KV cache grows
+      self.client.forward = torch.compile(self.client.forward, dynamic=True)
+
+    # With a schema every response is decoded under it and returned as
+    # a dict, as with JSONClient
+    self.grammar = None
+    if json_schema is not None:
+      self.grammar = SchemaGrammar(
+        self.tokenizer,
+        json_schema,
+        eos_token_id=self.client.generation_config.eos_token_id,
+      )
 
     self.history = list()
     self.reset()
@@ -34,27 +124,154 @@ class LocalClient:
       {"role": "system", "content": self.system_prompt},
     ]
 
-  def _request(self, messages):
-    chat = self.tokenizer.apply_chat_template(
+  def _chat(self, messages):
+    return self.tokenizer.apply_chat_template(
       messages,
       tokenize=False,
       add_generation_prompt=True
     )
+
+  def _sampling(self):
+    """
+    generate keyword arguments for sampling, and under a schema the
+    processors enforcing it.
+
+    Temperature, top-k and top-p would run before a user logits processor
+    and could cut every valid token, so under a schema they are turned
+    off in generate and re-applied after the mask instead.
+    """
+    if self.grammar is None:
+      return {"temperature": self.temperature, "top_p": self.top_p}
+
+    processor = SchemaLogitsProcessor(self.grammar)
+    processors = [processor, TemperatureLogitsWarper(self.temperature)]
+    top_k = self.client.generation_config.top_k
+    if top_k:
+      processors.append(TopKLogitsWarper(top_k))
+    processors.append(TopPLogitsWarper(self.top_p))
+
+    return {
+      "temperature": 1.0,
+      "top_k": 0,
+      "top_p": 1.0,
+      "logits_processor": LogitsProcessorList(processors),
+      "stopping_criteria": StoppingCriteriaList(
+        [SchemaStoppingCriteria(processor)]
+      ),
+    }
+
+  def _parse(self, response):
+    if self.grammar is None:
+      return response
+    # Only fails if max_tokens cut the object short
+    return json.loads(response)
+
+  def _reuse_cache(self, input_ids):
+    """
+    The kept cache cropped to its common prefix with `input_ids`, or a
+    fresh one if nothing is shared.
+    """
+    if self.kv_cache is None:
+      return DynamicCache()
+
+    ids = input_ids[0]
+    n = min(len(self.kv_ids), len(ids))
+    mismatch = (self.kv_ids[:n] != ids[:n]).nonzero()
+    common = mismatch[0].item() if len(mismatch) else n
+    # At least the last prompt token must go through the model
+    common = min(common, len(ids) - 1)
+    if common == 0:
+      return DynamicCache()
+
+    self.kv_cache.crop(common)
+    return self.kv_cache
+
+  def _request(self, messages):
+    chat = self._chat(messages)
     request = self.tokenizer(
       chat, return_tensors="pt"
     ).to(self.device)
+
+    cache = None
+    if self.prefix_cache:
+      cache = self._reuse_cache(request.input_ids)
+      # Dropped until generate succeeds; a failed one leaves it half filled
+      self.kv_cache = None
+
     with torch.no_grad():
       outputs = self.client.generate(
         **request,
+        past_key_values=cache,
         max_new_tokens=self.max_tokens,
-        temperature=self.temperature,
-        top_p=self.top_p
+        **self._sampling()
       )
+
+    if cache is not None:
+      self.kv_cache = cache
+      self.kv_ids = outputs[0][:cache.get_seq_length()]
+
     response = self.tokenizer.decode(
         outputs[0][request.input_ids.shape[-1]:],
         skip_special_tokens=True
     )
-    return response
+    return self._parse(response)
+
+  def _batches(self, lengths):
+    """
+    Split prompt indices into batches whose padded size, rows times
+    (longest prompt + max_tokens), fits batch_tokens. Prompts are sorted
+    by length so each batch pads little.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches, batch = [], []
+    for index in order:
+      # Sorted ascending, so this prompt is the batch's longest
+      size = (len(batch) + 1) * (lengths[index] + self.max_tokens)
+      if batch and size > self.batch_tokens:
+        batches.append(batch)
+        batch = []
+      batch.append(index)
+    if batch:
+      batches.append(batch)
+    return batches
+
+  def _request_batch(self, chats):
+    request = self.tokenizer(
+      chats, return_tensors="pt", padding=True
+    ).to(self.device)
+    with torch.no_grad():
+      outputs = self.client.generate(
+        **request,
+        max_new_tokens=self.max_tokens,
+        pad_token_id=self.tokenizer.pad_token_id,
+        **self._sampling()
+      )
+    responses = self.tokenizer.batch_decode(
+      outputs[:, request.input_ids.shape[-1]:],
+      skip_special_tokens=True
+    )
+    return [self._parse(response) for response in responses]
+
+  def generate_batch(self, inputs):
+    """
+    One-shot generation for many inputs (does not update history),
+    run as few batched generate calls as batch_tokens allows. Returns
+    the responses in input order.
+    """
+    chats = [
+      self._chat(self.history + [{"role": "user", "content": input}])
+      for input in inputs
+    ]
+    lengths = [
+      len(ids) for ids in self.tokenizer(chats).input_ids
+    ]
+
+    responses = [None] * len(chats)
+    for batch in self._batches(lengths):
+      outputs = self._request_batch([chats[i] for i in batch])
+      for index, output in zip(batch, outputs):
+        responses[index] = output
+    return responses
 
   def generate_once(self, input):
     """
@@ -70,7 +287,11 @@ class LocalClient:
     user_message = {"role": "user", "content": input}
     self.history.append(user_message)
     output = self._request(self.history)
-    assistant_message = {"role": "assistant", "content": output}
+    content = output
+    if self.grammar is not None:
+      # The exact text generated, so the next turn reuses its KV cache
+      content = json.dumps(output, separators=(",", ":"), ensure_ascii=False)
+    assistant_message = {"role": "assistant", "content": content}
     self.history.append(assistant_message)
     return output
 
@@ -0,0 +1,26 @@
+import time
+import threading
+
+
+class RateLimiter:
+    """
+    Spaces calls at least 1 / `rate` seconds apart across all threads.
+    A rate of None disables limiting.
+    """
+
+    def __init__(self, rate=None):
+        self.rate = rate
+        self.lock = threading.Lock()
+        self.next_time = 0.0
+
+    def acquire(self):
+        if not self.rate:
+            return
+
+        with self.lock:
+            now = time.monotonic()
+            wait = self.next_time - now
+            self.next_time = max(now, self.next_time) + 1 / self.rate
+
+        if wait > 0:
+            time.sleep(wait)
@@ -0,0 +1,190 @@
+import time
+import random
+import asyncio
+import threading
+
+from nash.clients.key_rotate import parse_duration
+
+
+# Status codes worth retrying: timeouts, conflicts, rate limits, outages
+TRANSIENT_STATUS = {408, 409, 425, 429}
+
+
+class RetriesExhausted(RuntimeError):
+    pass
+
+
+def is_transient(err: Exception) -> bool:
+    """
+    Whether retrying `err` can help. API errors carry a status code;
+    anything else (connection drops, timeouts, a reply that isn't valid
+    JSON) is assumed to be transient.
+    """
+    status = getattr(err, "status_code", None)
+    if status is None:
+        return not isinstance(err, (TypeError, AttributeError, KeyError))
+    return status in TRANSIENT_STATUS or status >= 500
+
+
+def is_outage(err: Exception) -> bool:
+    """
+    Whether `err` says the service is down: a 5xx, a timeout or a
+    dropped connection. Rate limits and bad replies are not; only
+    outages count toward the circuit breaker.
+    """
+    status = getattr(err, "status_code", None)
+    if status is not None:
+        return status >= 500 or status == 408
+    # Builtin, httpx and groq connection/timeout errors alike
+    return any(
+        "Connect" in cls.__name__ or "Timeout" in cls.__name__
+        for cls in type(err).__mro__
+    )
+
+
+def retry_after(err: Exception):
+    """
+    Seconds the provider asked us to wait, from the error's response.
+    """
+    response = getattr(err, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    milliseconds = parse_duration(headers.get("retry-after-ms"))
+    if milliseconds is not None:
+        return milliseconds / 1000
+    return parse_duration(headers.get("retry-after"))
+
+
+class RetryPolicy:
+    """
+    Retries transient failures with full-jitter exponential backoff,
+    waiting at least as long as a Retry-After says unless
+    `honor_retry_after` is off. Turn it off for clients that rotate API
+    keys: the header only benches the key that got it, which the rotator
+    already skips, so the worker can go on with another key. Permanent
+    errors (bad request, auth, ...) are raised at once.
+
+    `breaker_threshold` consecutive outages (see is_outage), counted
+    across all callers sharing the policy, open the circuit: calls then wait
+    for `breaker_cooldown` seconds, without using up attempts, after
+    which a single trial call decides whether it closes again.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 10,
+        base_delay: float = 0.5,
+        max_delay: float = 60.0,
+        breaker_threshold: int = 20,
+        breaker_cooldown: float = 60.0,
+        honor_retry_after: bool = True,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.honor_retry_after = honor_retry_after
+
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.open_until = 0.0
+        self.trial = False
+
+    def backoff(self, attempt: int, err: Exception) -> float:
+        delay = random.uniform(
+            0, min(self.max_delay, self.base_delay * 2 ** attempt)
+        )
+        asked = retry_after(err) if self.honor_retry_after else None
+        if asked is not None:
+            delay = max(delay, asked)
+        return delay
+
+    def _before(self) -> float:
+        """
+        Seconds to wait before a call may go out, 0 if it may go now.
+        """
+        with self.lock:
+            if self.failures < self.breaker_threshold:
+                return 0
+            now = time.monotonic()
+            if now < self.open_until:
+                return self.open_until - now
+            if self.trial:
+                # Another caller's trial is in flight: check back soon
+                return self.base_delay
+            # Cooled down: let this one call through as a trial
+            self.trial = True
+            return 0
+
+    def _succeeded(self):
+        with self.lock:
+            self.failures = 0
+            self.trial = False
+
+    def _failed(self, err: Exception, attempt: int):
+        """
+        Seconds to wait before the next attempt, or raise if there is
+        none.
+        """
+        if not is_transient(err):
+            with self.lock:
+                self.trial = False
+            raise err
+
+        with self.lock:
+            self.trial = False
+            if is_outage(err):
+                self.failures += 1
+                if self.failures >= self.breaker_threshold:
+                    self.open_until = (
+                        time.monotonic() + self.breaker_cooldown
+                    )
+
+        if attempt + 1 >= self.max_attempts:
+            raise RetriesExhausted(
+                f"gave up after {self.max_attempts} attempts"
+            ) from err
+        return self.backoff(attempt, err)
+
+    def call(self, fn, *args, on_retry=None):
+        """
+        fn(*args) under the policy. `on_retry(err, attempt, delay)` is
+        called before each wait.
+        """
+        for attempt in range(self.max_attempts):
+            wait = self._before()
+            while wait:
+                time.sleep(wait)
+                wait = self._before()
+            try:
+                result = fn(*args)
+            except Exception as err:
+                delay = self._failed(err, attempt)
+                if on_retry is not None:
+                    on_retry(err, attempt, delay)
+                time.sleep(delay)
+            else:
+                self._succeeded()
+                return result
+
+    async def acall(self, fn, *args, on_retry=None):
+        """
+        call for coroutine functions.
+        """
+        for attempt in range(self.max_attempts):
+            wait = self._before()
+            while wait:
+                await asyncio.sleep(wait)
+                wait = self._before()
+            try:
+                result = await fn(*args)
+            except Exception as err:
+                delay = self._failed(err, attempt)
+                if on_retry is not None:
+                    on_retry(err, attempt, delay)
+                await asyncio.sleep(delay)
+            else:
+                self._succeeded()
+                return result
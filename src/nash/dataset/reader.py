@@ -0,0 +1,158 @@
+import os
+import mmap
+import json
+from array import array
+from bisect import bisect_right
+
+from nash.dataset.writer import MANIFEST
+
+
+INDEX_SUFFIX = ".idx"
+# Index header: size and mtime of the file it was built from
+HEADER = 2
+
+
+class JSONLReader:
+    """
+    Random access to the records of a (plain, uncompressed) JSONL file,
+    or of a JSONLWriter shard directory read through its manifest.
+
+    A byte offset index of the record lines is built once and stored
+    next to the file as `<path>.idx`; later opens just load it. Records
+    are sliced out of an mmap of the file and parsed on access, so memory
+    stays flat whatever the file size. `parse` turns a line (str) into a
+    record and defaults to json.loads.
+
+    A shard directory gets one reader, and one index, per shard; its
+    shards must be uncompressed, gzip can't be sliced at an offset.
+    """
+
+    def __init__(self, path: str, parse=None, index_path: str = None):
+        self.path = path
+        self.parse = parse or json.loads
+        self.index_path = index_path or path + INDEX_SUFFIX
+
+        self.shards = None
+        if os.path.isdir(path):
+            self.open_shards()
+            return
+
+        self.fhand = open(self.path, "rb")
+        stat = os.fstat(self.fhand.fileno())
+        self.stamp = (stat.st_size, stat.st_mtime_ns)
+
+        self.mm = None
+        if stat.st_size:
+            self.mm = mmap.mmap(
+                self.fhand.fileno(), 0, access=mmap.ACCESS_READ
+            )
+
+        self.offsets = self.load_index()
+        if self.offsets is None:
+            self.offsets = self.build_index()
+            self.save_index()
+
+    def open_shards(self):
+        with open(os.path.join(self.path, MANIFEST)) as fhand:
+            names = [shard["name"] for shard in json.load(fhand)["shards"]]
+
+        compressed = [name for name in names if name.endswith(".gz")]
+        if compressed:
+            raise ValueError(
+                f"{self.path} has compressed shards ({compressed[0]}, ...), "
+                "which JSONLReader can't index; use read_records to stream "
+                "them, or write the dataset with compress=False"
+            )
+
+        self.shards = []
+        # Record index at which each shard starts, plus the total
+        self.starts = [0]
+        for name in names:
+            shard_path = os.path.join(self.path, name)
+            if not os.path.exists(shard_path):
+                continue
+            shard = JSONLReader(shard_path, parse=self.parse)
+            self.shards.append(shard)
+            self.starts.append(self.starts[-1] + len(shard))
+
+    def load_index(self):
+        try:
+            with open(self.index_path, "rb") as fhand:
+                offsets = array("Q")
+                offsets.frombytes(fhand.read())
+        except (FileNotFoundError, ValueError):
+            return None
+
+        if len(offsets) < HEADER or tuple(offsets[:HEADER]) != self.stamp:
+            return None
+        return offsets[HEADER:]
+
+    def build_index(self):
+        # Start and end offset of every record line, back to back. Blank
+        # and `null` lines (failed conversions) hold no record.
+        offsets = array("Q")
+        if self.mm is None:
+            return offsets
+
+        size = len(self.mm)
+        start = 0
+        while start < size:
+            end = self.mm.find(b"\n", start)
+            if end == -1:
+                end = size
+            if self.mm[start:end].strip() not in (b"", b"null"):
+                offsets.append(start)
+                offsets.append(end)
+            start = end + 1
+        return offsets
+
+    def save_index(self):
+        header = array("Q", self.stamp)
+        tmp = self.index_path + ".tmp"
+        try:
+            with open(tmp, "wb") as fhand:
+                fhand.write(header.tobytes())
+                fhand.write(self.offsets.tobytes())
+            os.replace(tmp, self.index_path)
+        except OSError:
+            # Read-only location, we just rebuild next time
+            pass
+
+    def __len__(self):
+        if self.shards is not None:
+            return self.starts[-1]
+        return len(self.offsets) // 2
+
+    def line(self, index: int) -> str:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        if self.shards is not None:
+            shard = bisect_right(self.starts, index) - 1
+            return self.shards[shard].line(index - self.starts[shard])
+        start = self.offsets[2 * index]
+        end = self.offsets[2 * index + 1]
+        return self.mm[start:end].decode()
+
+    def __getitem__(self, index: int):
+        return self.parse(self.line(index))
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def close(self):
+        if self.shards is not None:
+            for shard in self.shards:
+                shard.close()
+            return
+        if self.mm is not None:
+            self.mm.close()
+        self.fhand.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,233 @@
+import os
+import gzip
+import json
+import time
+import threading
+from pathlib import Path
+
+
+MANIFEST = "manifest.json"
+DURABILITY = ("none", "flush", "fsync")
+
+
+class JSONLWriter:
+    """
+    Buffered JSONL writer shared by the dataset producers.
+
+    Records are encoded into an in-memory buffer that is written out once
+    it holds `buffer_bytes` or is `flush_interval` seconds old, the latter
+    checked by a daemon thread so a writer gone quiet is flushed too. What a
+    flush guarantees is set by `durability`:
+      - "none":  handed to the file object, may still sit in its buffer
+      - "flush": handed to the OS, survives the process dying
+      - "fsync": on disk, survives the machine dying
+    `on_flush` callbacks run after each flush, once the records written so
+    far have that guarantee, holding the writer's lock and possibly on the
+    flush thread.
+
+    With `shard_bytes` set, `path` is a directory of shards holding about
+    that many bytes of JSON each (`part-00000.jsonl[.gz]`, ...) and a
+    manifest.json listing them. Otherwise `path` is a single file.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        buffer_bytes: int = 1 << 20,
+        flush_interval: float = 5.0,
+        durability: str = "flush",
+        shard_bytes: int = None,
+        compress: bool = False,
+        append: bool = True,
+        on_flush=None,
+    ):
+        if durability not in DURABILITY:
+            raise ValueError(f"durability must be one of {DURABILITY}")
+        if compress and not shard_bytes:
+            raise ValueError("compress needs shard_bytes")
+
+        self.path = Path(path)
+        self.buffer_bytes = buffer_bytes
+        self.flush_interval = flush_interval
+        self.durability = durability
+        self.shard_bytes = shard_bytes
+        self.compress = compress
+        self.on_flush = list(on_flush or [])
+
+        self.lock = threading.RLock()
+        self.buffer = []
+        self.buffered = 0
+        self.last_flush = time.monotonic()
+
+        self.fhand = None
+        self.shards = []
+        self.shard = None
+        self.closed = False
+        self.stopped = threading.Event()
+
+        if self.shard_bytes:
+            self.path.mkdir(parents=True, exist_ok=True)
+            manifest = self.path / MANIFEST
+            if append and manifest.exists():
+                self.shards = json.loads(manifest.read_text())["shards"]
+            elif not append:
+                for shard in self.path.glob("part-*"):
+                    shard.unlink()
+            self._rotate()
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.fhand = open(self.path, "ab" if append else "wb")
+
+        if self.flush_interval:
+            threading.Thread(
+                target=self._flush_periodically, daemon=True
+            ).start()
+
+    def _shard_name(self, index):
+        suffix = ".jsonl.gz" if self.compress else ".jsonl"
+        return f"part-{index:05d}{suffix}"
+
+    def _rotate(self):
+        if self.fhand is not None:
+            self._close_file()
+
+        # Always a fresh shard, appending to an old gzip member isn't worth it
+        self.shard = {
+            "name": self._shard_name(len(self.shards)),
+            "records": 0,
+            "bytes": 0,
+        }
+        self.shards.append(self.shard)
+        shard_path = self.path / self.shard["name"]
+        if self.compress:
+            self.fhand = gzip.open(shard_path, "wb")
+        else:
+            self.fhand = open(shard_path, "wb")
+        self._write_manifest()
+
+    def _close_file(self):
+        self.fhand.close()
+        if self.durability == "fsync":
+            fd = os.open(self.fhand.name, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        self.fhand = None
+
+    def _write_manifest(self):
+        if not self.shard_bytes:
+            return
+
+        for shard in self.shards:
+            shard_path = self.path / shard["name"]
+            if shard_path.exists():
+                shard["stored_bytes"] = shard_path.stat().st_size
+
+        tmp = self.path / (MANIFEST + ".tmp")
+        tmp.write_text(json.dumps({"shards": self.shards}, indent=2))
+        os.replace(tmp, self.path / MANIFEST)
+
+    def _sync(self):
+        if self.durability == "none":
+            return
+        self.fhand.flush()
+        if self.durability == "fsync":
+            os.fsync(self.fhand.fileno())
+
+    def write(self, record):
+        line = (json.dumps(record) + "\n").encode()
+
+        with self.lock:
+            if self.closed:
+                raise ValueError("write to closed JSONLWriter")
+
+            self.buffer.append(line)
+            self.buffered += len(line)
+
+            if self.buffered >= self.buffer_bytes or \
+                    time.monotonic() - self.last_flush >= self.flush_interval:
+                self.flush()
+
+    def _flush_periodically(self):
+        delay = self.flush_interval
+        while not self.stopped.wait(delay):
+            with self.lock:
+                if self.closed:
+                    return
+                age = time.monotonic() - self.last_flush
+                delay = self.flush_interval - age
+                if delay <= 0:
+                    if self.buffer:
+                        self.flush()
+                    delay = self.flush_interval
+
+    def write_many(self, records):
+        for record in records:
+            self.write(record)
+
+    def flush(self):
+        with self.lock:
+            for line in self.buffer:
+                if self.shard_bytes and self.shard["bytes"] >= self.shard_bytes:
+                    self._sync()
+                    self._rotate()
+                self.fhand.write(line)
+                if self.shard_bytes:
+                    self.shard["records"] += 1
+                    self.shard["bytes"] += len(line)
+
+            self.buffer = []
+            self.buffered = 0
+            self.last_flush = time.monotonic()
+            self._sync()
+            self._write_manifest()
+
+            for callback in self.on_flush:
+                callback()
+
+    def close(self):
+        self.stopped.set()
+        with self.lock:
+            if self.closed:
+                return
+            self.flush()
+            self._close_file()
+            self._write_manifest()
+            self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_records(path: str):
+    """
+    Iterate over the records of a JSONLWriter output, a single JSONL file
+    or a shard directory, skipping lines that don't parse.
+    """
+    path = Path(path)
+    if path.is_dir():
+        manifest = json.loads((path / MANIFEST).read_text())
+        files = [path / shard["name"] for shard in manifest["shards"]]
+    elif path.exists():
+        files = [path]
+    else:
+        files = []
+
+    for file in files:
+        if not file.exists():
+            continue
+        opener = gzip.open if file.suffix == ".gz" else open
+        with opener(file, "rt") as fhand:
+            try:
+                for line in fhand:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+            except EOFError:
+                # A shard whose writer died before closing it
+                continue
@@ -0,0 +1,194 @@
+import os
+import re
+import json
+import random
+import hashlib
+from array import array
+from collections import OrderedDict
+
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# Mersenne prime for the (a * x + b) mod P permutations
+PRIME = (1 << 61) - 1
+# Signatures keep the low 32 bits of each MinHash value
+MASK = (1 << 32) - 1
+
+
+class NearDuplicateIndex:
+    """
+    Streaming near-duplicate detector: MinHash signatures over token
+    shingles, bucketed by LSH bands.
+
+    A lookup hashes one text and probes `bands` buckets, each capped at
+    `bucket_size` entries, so it costs the same however many texts were
+    added. At most `capacity` signatures are kept, oldest evicted first;
+    each costs about 1 KB (a 32-bit array plus its band buckets), so the
+    default cap is about 100 MB.
+    """
+
+    def __init__(
+        self,
+        num_perm: int = 64,
+        bands: int = 8,
+        shingle: int = 3,
+        threshold: float = 0.8,
+        capacity: int = 100_000,
+        bucket_size: int = 8,
+        seed: int = 0,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle = shingle
+        self.threshold = threshold
+        self.capacity = capacity
+        self.bucket_size = bucket_size
+        self.seed = seed
+
+        rng = random.Random(seed)
+        self.perms = [
+            (rng.randrange(1, PRIME), rng.randrange(0, PRIME))
+            for _ in range(num_perm)
+        ]
+
+        self.signatures = OrderedDict()
+        # One dict per band, band hash -> item, or a list of items once
+        # several share the bucket (rare for distinct texts)
+        self.buckets = [{} for _ in range(bands)]
+        self.next_id = 0
+
+    def shingles(self, text: str):
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        if len(tokens) < self.shingle:
+            return {" ".join(tokens)}
+        return {
+            " ".join(tokens[i:i + self.shingle])
+            for i in range(len(tokens) - self.shingle + 1)
+        }
+
+    def signature(self, text: str) -> array:
+        hashes = [
+            int.from_bytes(
+                hashlib.blake2b(s.encode(), digest_size=8).digest(), "little"
+            )
+            for s in self.shingles(text)
+        ]
+        return array(
+            "I",
+            (
+                min((a * h + b) % PRIME for h in hashes) & MASK
+                for a, b in self.perms
+            ),
+        )
+
+    def band_keys(self, signature):
+        for band in range(self.bands):
+            start = band * self.rows
+            yield band, hash(signature[start:start + self.rows].tobytes())
+
+    def similarity(self, sig1, sig2):
+        return sum(x == y for x, y in zip(sig1, sig2)) / self.num_perm
+
+    def _find(self, signature):
+        for band, key in self.band_keys(signature):
+            items = self.buckets[band].get(key, ())
+            if isinstance(items, int):
+                items = (items,)
+            for item in items:
+                other = self.signatures.get(item)
+                if other is not None and \
+                        self.similarity(signature, other) >= self.threshold:
+                    return item
+        return None
+
+    def _add(self, signature):
+        item = self.next_id
+        self.next_id += 1
+        self.signatures[item] = signature
+
+        for band, key in self.band_keys(signature):
+            buckets = self.buckets[band]
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = item
+            elif isinstance(bucket, int):
+                buckets[key] = [bucket, item]
+            else:
+                bucket.append(item)
+                if len(bucket) > self.bucket_size:
+                    del bucket[0]
+
+        while len(self.signatures) > self.capacity:
+            old_item, old_signature = self.signatures.popitem(last=False)
+            for band, key in self.band_keys(old_signature):
+                buckets = self.buckets[band]
+                bucket = buckets.get(key)
+                if bucket == old_item:
+                    del buckets[key]
+                elif isinstance(bucket, list) and old_item in bucket:
+                    bucket.remove(old_item)
+                    if not bucket:
+                        del buckets[key]
+
+    def is_duplicate(self, text: str) -> bool:
+        return self._find(self.signature(text)) is not None
+
+    def add(self, text: str):
+        self._add(self.signature(text))
+
+    def check_and_add(self, text: str) -> bool:
+        """
+        True if `text` nearly duplicates an indexed text, otherwise index
+        it and return False.
+        """
+        signature = self.signature(text)
+        if self._find(signature) is not None:
+            return True
+        self._add(signature)
+        return False
+
+    def __len__(self):
+        return len(self.signatures)
+
+    def header(self, stamp):
+        return {
+            "num_perm": self.num_perm,
+            "bands": self.bands,
+            "shingle": self.shingle,
+            "seed": self.seed,
+            "stamp": stamp,
+        }
+
+    def save(self, path: str, stamp=None):
+        """
+        Write the signatures, oldest first, to `path`. `stamp` identifies
+        what they cover, for load to check.
+        """
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as fhand:
+            fhand.write(json.dumps(self.header(stamp)).encode() + b"\n")
+            for signature in self.signatures.values():
+                signature.tofile(fhand)
+        os.replace(tmp, path)
+
+    def load(self, path: str, stamp=None) -> bool:
+        """
+        Add the signatures saved at `path`, if it was saved with the same
+        settings and `stamp`. Returns whether it was.
+        """
+        try:
+            with open(path, "rb") as fhand:
+                if json.loads(fhand.readline()) != self.header(stamp):
+                    return False
+                data = array("I")
+                data.frombytes(fhand.read())
+        except (FileNotFoundError, ValueError):
+            return False
+
+        for start in range(0, len(data) - self.num_perm + 1, self.num_perm):
+            self._add(data[start:start + self.num_perm])
+        return True
@@ -0,0 +1,216 @@
+import time
+import threading
+from math import comb
+from statistics import mean, quantiles
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from nash.sandbox.sandbox import Sandbox
+from nash.clients.json_client import JSONClient
+from nash.clients.retry import RetryPolicy
+from nash.sandbox.pool import SandboxPool
+from nash.dataset.writer import JSONLWriter, read_records
+from nash.generation.generation import Task, Solver
+
+
+def pass_at_k(n: int, c: int, k: int) -> float:
+    """
+    Unbiased pass@k estimate from n attempts of which c passed.
+    """
+    if n - c < k:
+        return 1.0
+    return 1.0 - comb(n - c, k) / comb(n, k)
+
+
+def percentile_summary(values):
+    if not values:
+        return None
+    if len(values) == 1:
+        p50 = p90 = values[0]
+    else:
+        cuts = quantiles(values, n=10, method="inclusive")
+        p50, p90 = cuts[4], cuts[8]
+    return {"count": len(values), "mean": mean(values), "p50": p50, "p90": p90}
+
+
+class Evaluator:
+    """
+    Runs a Solver over every task of a task file (or shard directory).
+
+    Tasks are streamed and spread over `workers` threads, each holding
+    one sandbox from a pool and one LLM call in flight. Every task gets
+    `attempts` solver episodes; with more than one, they share one setup
+    through a snapshot that is removed once the task's attempts are done.
+    One result record per attempt, with its transcript, is written to
+    `result_path`.
+    """
+
+    def __init__(
+        self,
+        task_path: str,
+        result_path: str,
+        attempts: int = 1,
+        workers: int = 4,
+        sandbox_factory=Sandbox,
+        max_steps: int = 10,
+        client_factory=JSONClient,
+    ):
+        self.task_path = task_path
+        self.result_path = result_path
+        self.attempts = attempts
+        self.workers = workers
+        self.sandbox_factory = sandbox_factory
+        self.max_steps = max_steps
+        self.client_factory = client_factory
+        # Shared and per-thread like Generator's retry and local
+        self.retry = RetryPolicy(honor_retry_after=False)
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.timings = {}
+        self.outcomes = []
+        # Tasks using each setup snapshot, tasks may share a setup
+        self.snapshot_users = {}
+
+    @property
+    def solver(self) -> Solver:
+        if not hasattr(self.local, "solver"):
+            self.local.solver = Solver(
+                max_steps=self.max_steps,
+                client_factory=self.client_factory,
+                retry=self.retry,
+            )
+        return self.local.solver
+
+    def read_tasks(self):
+        for index, record in enumerate(read_records(self.task_path)):
+            try:
+                yield index, Task(**record)
+            except TypeError:
+                print("Skipping Malformed Task: ", index)
+
+    def evaluate_task(self, pool: SandboxPool, index: int, task: Task):
+        records = []
+        timings = {}
+
+        snapshot = self.attempts > 1
+
+        with pool.sandbox() as sandbox:
+            if snapshot:
+                tag = self.acquire_snapshot(sandbox, task)
+            try:
+                for attempt in range(self.attempts):
+                    records.append(
+                        self.evaluate_attempt(
+                            sandbox, index, task, attempt, timings, snapshot
+                        )
+                    )
+            finally:
+                if snapshot:
+                    self.release_snapshot(sandbox, tag)
+
+        with self.lock:
+            for stage, values in timings.items():
+                self.timings.setdefault(stage, []).extend(values)
+            self.outcomes.append(
+                (len(records), sum(record["solved"] for record in records))
+            )
+        return records
+
+    def evaluate_attempt(
+        self, sandbox, index, task, attempt, timings, snapshot
+    ):
+        start = time.monotonic()
+        try:
+            solved, transcript = self.solver.solve(
+                task, sandbox, timings, attempt, snapshot
+            )
+            error = None
+        except Exception as e:
+            solved, transcript, error = False, "", repr(e)
+
+        return {
+            "task_index": index,
+            "attempt": attempt,
+            "solved": solved,
+            "error": error,
+            "seconds": time.monotonic() - start,
+            "transcript": transcript,
+        }
+
+    def acquire_snapshot(self, sandbox, task: Task):
+        tag = sandbox.snapshot_tag(task.setup_command)
+        with self.lock:
+            self.snapshot_users[tag] = self.snapshot_users.get(tag, 0) + 1
+        return tag
+
+    def release_snapshot(self, sandbox, tag):
+        """
+        Remove the setup snapshot once no running task needs it.
+        """
+        with self.lock:
+            self.snapshot_users[tag] -= 1
+            if self.snapshot_users[tag]:
+                return
+            del self.snapshot_users[tag]
+            sandbox.remove_snapshot(tag)
+
+    def run(self):
+        start = time.monotonic()
+
+        with SandboxPool(self.workers, factory=self.sandbox_factory) as pool, \
+                JSONLWriter(self.result_path, append=False) as writer, \
+                ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = set()
+            for index, task in self.read_tasks():
+                # Keep the queue short so huge task files stream through
+                if len(pending) >= 2 * self.workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        writer.write_many(future.result())
+
+                print("Evaluating Task: ", index)
+                pending.add(
+                    executor.submit(self.evaluate_task, pool, index, task)
+                )
+
+            for future in pending:
+                writer.write_many(future.result())
+
+        return self.report(time.monotonic() - start)
+
+    def report(self, elapsed: float):
+        num_tasks = len(self.outcomes)
+        report = {
+            "tasks": num_tasks,
+            "attempts": sum(n for n, _ in self.outcomes),
+            "seconds": elapsed,
+            "tasks_per_minute": 60 * num_tasks / elapsed if elapsed else 0.0,
+            "pass_at_k": {
+                k: mean(pass_at_k(n, c, k) for n, c in self.outcomes)
+                for k in range(1, self.attempts + 1)
+            } if num_tasks else {},
+            "latency": {
+                stage: percentile_summary(values)
+                for stage, values in self.timings.items()
+            },
+        }
+
+        print(f"Tasks: {report['tasks']}  Attempts: {report['attempts']}")
+        print(f"Throughput: {report['tasks_per_minute']:.2f} tasks/min")
+        for k, value in report["pass_at_k"].items():
+            print(f"pass@{k}: {value:.3f}")
+        for stage, summary in report["latency"].items():
+            print(
+                f"{stage:>6}: n={summary['count']} "
+                f"mean={summary['mean']:.3f}s "
+                f"p50={summary['p50']:.3f}s p90={summary['p90']:.3f}s"
+            )
+        return report
+
+
+if __name__ == "__main__":
+    evaluator = Evaluator(
+        "../data/generated_tasks.jsonl",
+        "../data/eval_results.jsonl",
+        attempts=5,
+    )
+    evaluator.run()
@@ -1,8 +1,13 @@
 import json
 import time
+import threading
+import subprocess
+from collections import deque
 from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 from nash.sandbox.sandbox import Sandbox
+from nash.sandbox.pool import SandboxPool
 from nash.generation.prompts import (
     GENERATOR_SYSTEM_PROMPT,
     GENERATOR_JSON_SCHEMA,
@@ -12,10 +17,24 @@ from nash.generation.prompts import (
     SOLVER_USER_PROMPT_TEMPLATE as SOLVER_USER_PROMPT
 )
 from nash.clients.json_client import JSONClient
+from nash.clients.rate_limit import RateLimiter
+from nash.clients.retry import RetryPolicy
+from nash.generation.journal import Journal
+from nash.generation.dedup import NearDuplicateIndex
+from nash.generation.history import StepHistory
+from nash.dataset.writer import JSONLWriter, read_records
+from nash.dataset.reader import JSONLReader
 
 
 MAX_RETRY_COUNT = 100
+# Earlier tasks hashed into a cold duplicate index, the most recent ones
+DEDUP_WARMUP = 10_000
+# Finished units held back behind a slow one, so they are written in order
+REORDER_LIMIT = 10_000
 MODEL_NAME = "meta-llama/llama-4-scout-17b-16e-instruct"
+VERIFY_TIMEOUT = 60
+# Reject reason of a task that nearly duplicates an earlier one
+DUPLICATE = "duplicate"
 
 
 @dataclass
@@ -25,6 +44,50 @@ class Task:
     setup_command: str
     success_condition: str
 
+
+def task_text(task: Task) -> str:
+    return "\n".join(
+        str(part or "")
+        for part in (
+            task.description,
+            task.setup_command,
+            task.success_condition,
+        )
+    )
+
+
+def verify_task(task: Task, sandbox: Sandbox):
+    """
+    Check a task is well-formed on an untouched sandbox: its setup must
+    succeed and its success condition must not already hold.
+    Returns (ok, reason).
+    """
+    if not task.description or not task.setup_command \
+            or not task.success_condition:
+        return False, "missing description, setup or success condition"
+
+    try:
+        setup = sandbox.exec_shell(task.setup_command, timeout=VERIFY_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        return False, "setup timed out"
+    if setup.returncode != 0:
+        return False, (
+            f"setup failed (exit {setup.returncode}): "
+            f"{setup.stderr.strip()[-500:]}"
+        )
+
+    try:
+        check = sandbox.exec_shell(
+            task.success_condition, timeout=VERIFY_TIMEOUT
+        )
+    except subprocess.TimeoutExpired:
+        return False, "success condition timed out"
+    if check.returncode == 0:
+        return False, "success condition passes before any work"
+
+    return True, None
+
+
 @dataclass
 class Solution:
     reasoning: str
@@ -36,19 +99,65 @@ class Generator:
         self,
         seed_path: str,
         task_path: str,
-        multiplier = 100
+        multiplier = 100,
+        workers: int = 1,
+        rate_limit: float = None,
+        journal_path: str = None,
+        dedup: bool = True,
+        writer: JSONLWriter = None,
+        verify: bool = False,
+        reject_path: str = None,
+        sandbox_factory=Sandbox,
+        client_factory=JSONClient,
+        retry: RetryPolicy = None,
     ):
         self.seeds = []
         self.task_path = task_path
+        self.journal = Journal(journal_path or task_path + ".journal")
+        # Units are journaled only once their task has been flushed
+        self.pending_units = []
+        self.writer = writer or JSONLWriter(task_path)
+        self.writer.on_flush.append(self.commit_units)
+        self.dedup = None
+        self.dedup_lock = threading.Lock()
+        # Saved on close, valid while the journal hasn't moved on since
+        self.dedup_path = self.journal.path + ".dedup"
+        if dedup:
+            self.dedup = NearDuplicateIndex()
+            if not self.dedup.load(self.dedup_path, len(self.journal)):
+                self.dedup = NearDuplicateIndex()
+                self.index_tasks(task_path)
+        self.verify = verify
+        self.sandbox_factory = sandbox_factory
+        self.pool = None
+        self.rejects = None
+        if verify:
+            self.rejects = JSONLWriter(reject_path or task_path + ".rejects")
         self.multiplier = multiplier
-        self.client = JSONClient(
-            model_name=MODEL_NAME,
-            system_prompt=GENERATOR_SYSTEM_PROMPT,
-            json_schema=GENERATOR_JSON_SCHEMA,
+        self.workers = workers
+        self.limiter = RateLimiter(rate_limit)
+        # Shared by all workers, so an outage trips one circuit breaker.
+        # The key rotator benches a rate-limited key, so Retry-After
+        # needn't stall the worker
+        self.retry = retry or RetryPolicy(
+            max_attempts=MAX_RETRY_COUNT, honor_retry_after=False
         )
+        self.client_factory = client_factory
+        # JSONClient swaps keys on its Groq client, so one per thread
+        self.local = threading.local()
 
         self.read_seeds(seed_path)
 
+    @property
+    def client(self) -> JSONClient:
+        if not hasattr(self.local, "client"):
+            self.local.client = self.client_factory(
+                model_name=MODEL_NAME,
+                system_prompt=GENERATOR_SYSTEM_PROMPT,
+                json_schema=GENERATOR_JSON_SCHEMA,
+            )
+        return self.local.client
+
     def read_seed(self, seed_str: str):
         seed = json.loads(seed_str)
         if seed is None:
@@ -62,26 +171,65 @@ class Generator:
             )
 
     def read_seeds(self, path: str):
-        with open(path, "r") as fhand:
-            for line in fhand:
-                seed = self.read_seed(line)
-                if seed is not None:
-                    self.seeds.append(seed)
+        """
+        Open the seeds lazily: records are parsed when first accessed, from
+        an mmap and a byte offset index built once next to the file.
+        """
+        self.seeds = JSONLReader(path, parse=self.read_seed)
+
+    def index_tasks(self, path: str, limit: int = DEDUP_WARMUP):
+        """
+        Seed the duplicate index with the last `limit` tasks written by
+        earlier runs, when there is no saved index to load.
+        """
+        recent = deque(maxlen=limit)
+        for record in read_records(path):
+            recent.append(record)
+        for record in recent:
+            try:
+                task = Task(**record)
+            except TypeError:
+                continue
+            self.dedup.add(task_text(task))
 
     def write_task(self, task: Task):
-        with open(self.task_path, "a") as fhand:
-            fhand.write(json.dumps(task.__dict__) + "\n")
+        self.writer.write(task.__dict__)
+
+    def commit_units(self):
+        for unit in self.pending_units:
+            self.journal.mark(unit)
+        self.pending_units = []
+
+    def write_reject(self, unit, task: Task, reason: str):
+        self.rejects.write(
+            {
+                "seed_index": unit[0],
+                "replica": unit[1],
+                "reason": reason,
+                **task.__dict__,
+            }
+        )
+
+    def close(self):
+        self.writer.close()
+        if self.rejects is not None:
+            self.rejects.close()
+        if self.dedup is not None:
+            self.dedup.save(self.dedup_path, len(self.journal))
+        self.journal.close()
 
     def write_tasks(self, tasks: list[Task]):
         for task in tasks:
             self.write_task(task)
 
-    def generate_one(self, index: int):
+    def generate_one(self, index: int, replica: int = None):
         if index + 1 >= len(self.seeds):
             return None
 
         seed1 = self.seeds[index]
         seed2 = self.seeds[index + 1]
+        if seed1 is None or seed2 is None:
+            return None
 
         prompt = GENERATOR_USER_PROMPT.format(
             task_1=seed1.description,
@@ -92,19 +240,18 @@ class Generator:
             success_2=seed2.success_condition,
         )
 
-        response = None
-        for _ in range(MAX_RETRY_COUNT):
-            try:
-                response = self.client.generate_once(prompt)
-            except Exception as e:
-                print(self.client.client.api_key)
-                print(e)
-                print("Generation Retrying...")
-                time.sleep(3)
-            else:
-                break
-
-        if response is None:
+        def attempt():
+            self.limiter.acquire()
+            return self.client.generate_once(prompt, replica)
+
+        def on_retry(err, attempt, delay):
+            print(err)
+            print(f"Generation Retrying in {delay:.1f}s...")
+
+        try:
+            response = self.retry.call(attempt, on_retry=on_retry)
+        except Exception as e:
+            print("Generation Failed: ", e)
             return None
 
         return Task(
@@ -114,72 +261,210 @@ class Generator:
             " && ".join(response.get("success_condition") or []),
         )
 
-    def generate(self, offset):
+    def is_duplicate(self, task: Task) -> bool:
+        if self.dedup is None:
+            return False
+        with self.dedup_lock:
+            return self.dedup.check_and_add(task_text(task))
+
+    def generate_unit(self, unit):
+        """
+        Returns (task, reject reason), reason is None for a good task and
+        DUPLICATE for a near-duplicate, which is caught before it costs a
+        verification sandbox.
+        """
+        index, replica = unit
+        print("Generating Task: ", index, replica)
+        task = self.generate_one(index, replica)
+
+        if task is None:
+            return task, None
+        if self.is_duplicate(task):
+            return task, DUPLICATE
+        if not self.verify:
+            return task, None
+
+        with self.pool.sandbox() as sandbox:
+            ok, reason = verify_task(task, sandbox)
+        return task, reason
+
+    def generate(self, offset=0):
+        """
+        Generate `multiplier` tasks per adjacent seed pair from `offset` on,
+        with up to `workers` requests in flight. Tasks are written in
+        (seed index, replica) order whatever order they finish in.
+
+        Units already in the journal are skipped, so rerunning after a
+        crash picks up where the last run stopped.
+
+        With `verify`, each task is first checked in a fresh sandbox (see
+        verify_task) and rejects go to the reject file with the reason.
+        """
         num_seeds = len(self.seeds)
-        for i in range(offset, num_seeds - 1):
-            for _ in range(self.multiplier):
-                print("Generating Task: ", i, _)
-
-                task = self.generate_one(i)
-                if task is None:
-                    print("Failed Generation: ", i, _)
-                    continue
+        units = (
+            (i, replica)
+            for i in range(offset, num_seeds - 1)
+            for replica in range(self.multiplier)
+            if (i, replica) not in self.journal
+        )
 
+        if self.verify:
+            self.pool = SandboxPool(self.workers, factory=self.sandbox_factory)
+
+        try:
+            self.generate_units(units)
+        finally:
+            if self.pool is not None:
+                self.pool.close()
+                self.pool = None
+
+        self.writer.flush()
+        if self.rejects is not None:
+            self.rejects.flush()
+
+    def generate_units(self, units):
+        """
+        Run `units` with 2 * workers in flight and handle results in
+        submission order. A slow unit doesn't idle the other workers:
+        units finished after it wait in a reorder buffer, and submission
+        only pauses once REORDER_LIMIT of them are held back.
+        """
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = deque()
+            running = set()
+            for unit in units:
+                while len(running) >= 2 * self.workers or \
+                        len(pending) >= REORDER_LIMIT:
+                    self.drain(pending, running)
+                future = executor.submit(self.generate_unit, unit)
+                pending.append((unit, future))
+                running.add(future)
+
+            while pending:
+                self.drain(pending, running)
+
+    def drain(self, pending, running):
+        """
+        Wait for a unit to finish, then handle the finished head of
+        `pending`.
+        """
+        if running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            running.difference_update(done)
+        while pending and pending[0][1].done():
+            self.handle_result(*pending.popleft())
+
+    def handle_result(self, unit, future):
+        task, reason = future.result()
+        if task is None:
+            # Not journaled, so the next run tries it again
+            print("Failed Generation: ", *unit)
+            return
+
+        if reason is DUPLICATE:
+            print("Duplicate Task: ", *unit)
+        elif reason is not None:
+            print("Rejected Task: ", *unit, reason)
+            self.write_reject(unit, task, reason)
+        # commit_units may run on the writer's flush thread
+        with self.writer.lock:
+            if reason is None:
                 self.write_task(task)
+            self.pending_units.append(unit)
 
 
 class Solver:
-    def __init__(self, max_steps: int = 10):
+    def __init__(
+        self,
+        max_steps: int = 10,
+        token_budget: int = 4000,
+        keep_recent: int = 2,
+        client_factory=JSONClient,
+        retry: RetryPolicy = None,
+    ):
         self.max_steps = max_steps
-        self.client = JSONClient(
+        self.retry = retry or RetryPolicy(honor_retry_after=False)
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.client = client_factory(
             model_name=MODEL_NAME,
             system_prompt=SOLVER_SYSTEM_PROMPT,
             json_schema=SOLVER_JSON_SCHEMA
         )
 
-    def solve(self, task: Task, sandbox: Sandbox):
+    def solve(
+        self,
+        task: Task,
+        sandbox: Sandbox,
+        timings: dict = None,
+        sample: int = None,
+        snapshot: bool = False,
+    ):
+        """
+        Returns whether the task was solved and the full transcript. The
+        prompt only carries the token budgeted rendering of the history.
+
+        If `timings` is given, the seconds spent in each stage (setup, llm,
+        exec, check) are appended to its lists. `sample` keeps the LLM
+        calls of separate attempts apart in a response cache. `snapshot`
+        keeps a snapshot of the setup for further attempts (see
+        Sandbox.prepare).
+        """
+        if timings is None:
+            timings = {}
+
+        def timed(stage, fn, *args):
+            start = time.monotonic()
+            try:
+                return fn(*args)
+            finally:
+                timings.setdefault(stage, []).append(time.monotonic() - start)
+
         steps = 0
-        history = ""
+        history = StepHistory(self.token_budget, self.keep_recent)
 
-        setup_result = sandbox.exec_shell(task.setup_command)
+        setup_result = timed(
+            "setup",
+            lambda: sandbox.prepare(task.setup_command, snapshot=snapshot),
+        )
         if setup_result.returncode != 0:
-            return False, history
+            return False, history.transcript()
 
         while steps < self.max_steps:
             prompt = SOLVER_USER_PROMPT.format(
                 task=task.description,
-                history=history
+                history=history.render()
             )
 
-            response = self.client.generate_once(prompt)
+            response = timed(
+                "llm",
+                self.retry.call,
+                self.client.generate_once,
+                prompt,
+                sample,
+            )
             solution = Solution(
                 response.get("reasoning"),
                 response.get("command")
             )
 
-            result = sandbox.exec_shell(solution.solution_command)
-
-            history += "\n".join(
-                [
-                    f"$ {solution.solution_command}",
-                    f"EXIT CODE:{result.returncode}",
-                    f"STDOUT:\n{result.stdout}",
-                    f"STDERR:\n{result.stderr}",
-                    "\n",
-                ]
+            result = timed(
+                "exec", sandbox.exec_shell, solution.solution_command
             )
 
+            history.add(solution.solution_command, result)
+
             if result.returncode != 0:
                 steps += 1
                 continue
 
-            check = sandbox.exec_shell(task.success_condition)
+            check = timed("check", sandbox.exec_shell, task.success_condition)
             if check.returncode == 0:
-                return True, history
+                return True, history.transcript()
 
             steps += 1
 
-        return False, history
+        return False, history.transcript()
 
 
 if __name__ == "__main__":
@@ -188,5 +473,5 @@ if __name__ == "__main__":
         "../data/generated_tasks.jsonl"
     )
 
-    offset = int(input("Enter Seed Offset: "))
-    generator.generate(offset)
+    generator.generate()
+    generator.close()
@@ -0,0 +1,113 @@
+from dataclasses import dataclass
+
+
+# Rough chars per token, good enough to budget a prompt without a tokenizer
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def trim(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    half = limit // 2
+    skipped = len(text) - 2 * half
+    return f"{text[:half]}\n[... {skipped} chars trimmed ...]\n{text[-half:]}"
+
+
+@dataclass
+class Step:
+    command: str
+    returncode: int
+    stdout: str
+    stderr: str
+
+    def verbatim(self) -> str:
+        return "\n".join(
+            [
+                f"$ {self.command}",
+                f"EXIT CODE:{self.returncode}",
+                f"STDOUT:\n{self.stdout}",
+                f"STDERR:\n{self.stderr}",
+                "\n",
+            ]
+        )
+
+    def compressed(self, output_chars: int) -> str:
+        return "\n".join(
+            [
+                f"$ {self.command}",
+                f"EXIT CODE:{self.returncode}",
+                f"STDOUT:\n{trim(self.stdout, output_chars)}",
+                f"STDERR:\n{trim(self.stderr, output_chars)}",
+                "\n",
+            ]
+        )
+
+
+class StepHistory:
+    """
+    Solver history that fits in `token_budget` tokens.
+
+    The newest `keep_recent` steps are rendered verbatim, older ones with
+    their output trimmed to `output_chars`, and once even that doesn't fit
+    the oldest steps are left out altogether. Each step's renderings are
+    computed once, so a prompt costs O(steps) and at most the budget.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 4000,
+        keep_recent: int = 2,
+        output_chars: int = 200,
+    ):
+        self.token_budget = token_budget
+        self.keep_recent = keep_recent
+        self.output_chars = output_chars
+        self.steps = []
+        # (verbatim, compressed) text and token estimate of each step
+        self.rendered = []
+
+    def add(self, command: str, result):
+        step = Step(command, result.returncode, result.stdout, result.stderr)
+        self.steps.append(step)
+
+        verbatim = step.verbatim()
+        compressed = step.compressed(self.output_chars)
+        self.rendered.append(
+            (
+                (verbatim, estimate_tokens(verbatim)),
+                (compressed, estimate_tokens(compressed)),
+            )
+        )
+        return step
+
+    def render(self) -> str:
+        parts = []
+        budget = self.token_budget
+        recent_from = len(self.steps) - self.keep_recent
+
+        for index in range(len(self.steps) - 1, -1, -1):
+            full, short = self.rendered[index]
+            if index >= recent_from and full[1] <= budget:
+                text, tokens = full
+            elif short[1] <= budget:
+                text, tokens = short
+            else:
+                parts.append(f"[... {index + 1} earlier steps omitted ...]\n")
+                break
+            parts.append(text)
+            budget -= tokens
+
+        return "".join(reversed(parts))
+
+    def transcript(self) -> str:
+        """
+        The whole history verbatim, for logging trajectories.
+        """
+        return "".join(full[0] for full, _ in self.rendered)
+
+    def __len__(self):
+        return len(self.steps)
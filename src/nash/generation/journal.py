@@ -0,0 +1,43 @@
+import threading
+
+
+class Journal:
+    """
+    Append-only log of finished (seed index, replica) units, so a restarted
+    run can skip them. One short line per unit on a handle kept open.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done = set()
+        self.lock = threading.Lock()
+
+        try:
+            with open(self.path, "r") as fhand:
+                for line in fhand:
+                    fields = line.split()
+                    # A torn last line from a crash is just not done yet
+                    if len(fields) == 2 and all(f.isdigit() for f in fields):
+                        self.done.add((int(fields[0]), int(fields[1])))
+        except FileNotFoundError:
+            pass
+
+        self.fhand = open(self.path, "a")
+
+    def __contains__(self, unit):
+        return unit in self.done
+
+    def __len__(self):
+        return len(self.done)
+
+    def mark(self, unit):
+        with self.lock:
+            if unit in self.done:
+                return
+            self.done.add(unit)
+            self.fhand.write(f"{unit[0]} {unit[1]}\n")
+            self.fhand.flush()
+
+    def close(self):
+        with self.lock:
+            self.fhand.close()
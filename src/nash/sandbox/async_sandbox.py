@@ -0,0 +1,205 @@
+import uuid
+import asyncio
+import subprocess
+
+from nash.sandbox.sandbox import limit_flags
+from nash.sandbox.session import kill_tree_command
+from nash.sandbox.capture import (
+    HEAD_BYTES,
+    TAIL_BYTES,
+    BoundedCapture,
+    TrailerCapture,
+    ExecResult,
+)
+from nash.sandbox.usage import STATS_MARKER, wrap_command, parse_stats
+
+
+# Reports its pid on the first stderr line, so a timed out or cancelled
+# command can be killed inside the container and not just its docker client
+WRAPPER = 'echo $$ >&2; exec bash -lc "$1"'
+
+
+class AsyncSandbox:
+    """
+    asyncio counterpart of Sandbox, for driving many containers from one
+    event loop. Create with `await AsyncSandbox.create(...)`.
+    """
+
+    def __init__(
+        self,
+        image="ubuntu:24.04",
+        head_bytes=HEAD_BYTES,
+        tail_bytes=TAIL_BYTES,
+        cpus=None,
+        memory=None,
+        pids=None,
+    ):
+        self.image = image
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.limits = limit_flags(cpus, memory, pids)
+        self.container_id = None
+        self.container_name = None
+
+    @classmethod
+    async def create(cls, *args, **kwargs):
+        sandbox = cls(*args, **kwargs)
+        await sandbox.init()
+        return sandbox
+
+    async def _run(self, args, timeout=30, check=False):
+        proc = await asyncio.create_subprocess_exec(
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+        except BaseException:
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+            raise
+
+        result = subprocess.CompletedProcess(
+            args, proc.returncode, stdout.decode(), stderr.decode()
+        )
+        if check:
+            result.check_returncode()
+        return result
+
+    async def init(self):
+        self.container_name = f"sandbox_{uuid.uuid4().hex[:8]}"
+        result = await self._run(
+            [
+                "docker",
+                "run",
+                "-d",
+                "--rm",
+                "--name",
+                self.container_name,
+                *self.limits,
+                self.image,
+                "sleep",
+                "infinity",
+            ],
+            check=True,
+        )
+
+        self.container_id = result.stdout.strip()
+
+        await self.exec_shell("apt-get update -y", check=False)
+        return result
+
+    async def kill(self):
+        if not self.container_id:
+            return None
+
+        container_id, self.container_id = self.container_id, None
+        return await self._run(["docker", "kill", container_id])
+
+    async def reset(self):
+        await self.kill()
+        return await self.init()
+
+    async def _terminate(self, proc, pid):
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        if pid is not None and self.container_id:
+            await self._run(
+                [
+                    "docker",
+                    "exec",
+                    self.container_id,
+                    "bash",
+                    "-c",
+                    kill_tree_command(pid),
+                ]
+            )
+
+    async def exec_shell(self, command, timeout=30, check=False):
+        """
+        Execute a full shell command inside the container.
+        Output is captured the same bounded way as Sandbox.exec_shell.
+
+        On timeout (raised as subprocess.TimeoutExpired) or cancellation
+        the command's process tree in the container is killed too.
+        """
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadline = None if timeout is None else start + timeout
+
+        proc = await asyncio.create_subprocess_exec(
+            "docker",
+            "exec",
+            self.container_id,
+            "bash",
+            "-c",
+            WRAPPER,
+            "bash",
+            wrap_command(command),
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+
+        stdout = BoundedCapture(self.head_bytes, self.tail_bytes)
+        stderr = TrailerCapture(STATS_MARKER, self.head_bytes, self.tail_bytes)
+
+        async def drain(stream, capture):
+            while True:
+                chunk = await stream.read(65536)
+                if not chunk:
+                    break
+                capture.feed(chunk)
+
+        pid = None
+        io = None
+        try:
+            line = await asyncio.wait_for(proc.stderr.readline(), timeout)
+            if line.strip().isdigit():
+                pid = int(line)
+            else:
+                stderr.feed(line)
+
+            remaining = None if deadline is None else deadline - loop.time()
+            io = asyncio.gather(
+                drain(proc.stdout, stdout),
+                drain(proc.stderr, stderr),
+                proc.wait(),
+            )
+            await asyncio.wait_for(io, remaining)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            await asyncio.shield(self._clean_up(proc, pid, io))
+            if isinstance(e, asyncio.TimeoutError):
+                raise subprocess.TimeoutExpired(command, timeout) from None
+            raise
+
+        cpu_time, container_peak = parse_stats(stderr.close())
+        result = ExecResult(
+            command,
+            proc.returncode,
+            stdout,
+            stderr,
+            wall_time=loop.time() - start,
+            cpu_time=cpu_time,
+            container_peak=container_peak,
+        )
+        if check:
+            result.check_returncode()
+        return result
+
+    async def _clean_up(self, proc, pid, io):
+        await self._terminate(proc, pid)
+        if io is not None:
+            io.cancel()
+            # Collect its outcome, or asyncio logs it as never retrieved
+            await asyncio.gather(io, return_exceptions=True)
+
+    async def __aenter__(self):
+        if self.container_id is None:
+            await self.init()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.kill()
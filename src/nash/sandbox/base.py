@@ -0,0 +1,199 @@
+import hashlib
+import subprocess
+
+from nash.sandbox.session import ShellSession
+from nash.sandbox.capture import HEAD_BYTES, TAIL_BYTES, run_bounded
+from nash.sandbox.usage import wrap_command
+from nash.sandbox.batch import batch_script, parse_batch
+
+
+class BaseSandbox:
+    """
+    Backend independent part of a sandbox.
+
+    A backend implements init/kill, snapshot/has_snapshot/rollback and the
+    argv builders below; command execution, session mode and setup
+    snapshots are shared.
+    """
+
+    # Whether the rusage of the argv's process covers the command, i.e.
+    # the backend runs it as our descendant rather than through a daemon
+    rusage_peak = False
+
+    def __init__(
+        self,
+        session=False,
+        head_bytes=HEAD_BYTES,
+        tail_bytes=TAIL_BYTES,
+    ):
+        self.session = session
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.shell = None
+        self.dirty = False
+        self.snapshot_image = None
+
+    def init(self):
+        raise NotImplementedError
+
+    def kill(self):
+        raise NotImplementedError
+
+    def shell_argv(self):
+        """
+        argv of a login bash reading commands from stdin.
+        """
+        raise NotImplementedError
+
+    def command_argv(self, script):
+        """
+        argv running `script` with a login bash.
+        """
+        raise NotImplementedError
+
+    def session_killer(self, pid):
+        """
+        Kill the process tree under the session shell `pid`.
+        """
+        return None
+
+    def close_shell(self):
+        if self.shell is not None:
+            self.shell.close()
+            self.shell = None
+
+    def reset(self):
+        self.kill()
+        return self.init()
+
+    def _shell(self):
+        if self.shell is None or not self.shell.alive():
+            self.shell = ShellSession(
+                self.shell_argv(),
+                killer=self.session_killer,
+                head=self.head_bytes,
+                tail=self.tail_bytes,
+            )
+        return self.shell
+
+    def exec_shell(self, command, timeout=30, check=False):
+        """
+        Execute a full shell command inside the sandbox.
+        Supports pipes, redirects, &&, etc.
+
+        In session mode all commands share one long-lived bash, so cwd and
+        exported variables persist between calls.
+
+        Only the first `head_bytes` and last `tail_bytes` of each stream
+        are kept, the result's stdout_bytes/stderr_bytes give the full size.
+        The result also carries wall_time and cpu_time, and peak_rss, the
+        command's own memory high-water mark, where the backend can tell
+        it (see rusage_peak). Container backends report container_peak
+        instead, the high-water mark of the whole container so far.
+        """
+        self.dirty = True
+        if self.session:
+            result = self._shell().run(command, timeout=timeout, check=check)
+        else:
+            result = run_bounded(
+                self.command_argv(wrap_command(command)),
+                timeout=timeout,
+                check=check,
+                head=self.head_bytes,
+                tail=self.tail_bytes,
+                stats=True,
+            )
+            if self.rusage_peak:
+                result.peak_rss = result.rusage.ru_maxrss * 1024
+
+        if self.rusage_peak:
+            # No cgroup of its own, what the stats read is the host's
+            result.container_peak = None
+        return result
+
+    def exec_batch(self, scripts, timeout=30, parallel=1, batch_timeout=None):
+        """
+        Run many independent scripts in a single round trip.
+
+        Each script runs in its own subshell and fresh temporary working
+        directory and is killed after `timeout` seconds. They do share the
+        sandbox's filesystem, so with `parallel` > 1 they must not touch
+        the same absolute paths. Returns one ExecResult per script, in
+        order, None for any the batch did not finish within
+        `batch_timeout` seconds.
+        """
+        if not scripts:
+            return []
+
+        self.dirty = True
+        driver = batch_script(
+            scripts, timeout, self.head_bytes, self.tail_bytes, parallel
+        )
+        # Head/tail of both streams per script, base64 encoded, plus headers
+        report_bytes = (self.head_bytes + self.tail_bytes) * 3 + 1024
+        try:
+            stdout = run_bounded(
+                self.shell_argv(),
+                timeout=batch_timeout,
+                input=driver.encode(),
+                head=report_bytes * len(scripts),
+                tail=0,
+            ).stdout
+        except subprocess.TimeoutExpired as err:
+            # Scripts that reported before the deadline still count
+            stdout = err.output or ""
+        return parse_batch(stdout, scripts, self.head_bytes, self.tail_bytes)
+
+    def snapshot_key(self):
+        """
+        What the base environment is, snapshots are only shared between
+        sandboxes with the same key.
+        """
+        raise NotImplementedError
+
+    def snapshot_tag(self, setup_command):
+        digest = hashlib.sha256(
+            f"{self.snapshot_key()}\0{setup_command}".encode()
+        ).hexdigest()
+        return digest[:16]
+
+    def has_snapshot(self, tag):
+        raise NotImplementedError
+
+    def snapshot(self, tag):
+        raise NotImplementedError
+
+    def rollback(self, tag=None):
+        raise NotImplementedError
+
+    def remove_snapshot(self, tag):
+        raise NotImplementedError
+
+    def prepare(self, setup_command, timeout=30, snapshot=False):
+        """
+        Bring the sandbox to the state right after `setup_command`.
+
+        Setups are snapshotted under a hash of (base environment,
+        setup_command). If the setup has a snapshot, roll back to it
+        instead of redoing setup. With `snapshot`, for when more attempts
+        at the same task are coming, a successful run is snapshotted; the
+        caller removes it (remove_snapshot) once they are done.
+        """
+        tag = self.snapshot_tag(setup_command)
+        if self.has_snapshot(tag):
+            self.rollback(tag)
+            return subprocess.CompletedProcess(setup_command, 0, "", "")
+
+        if self.dirty:
+            self.reset()
+
+        result = self.exec_shell(setup_command, timeout=timeout)
+        if result.returncode == 0 and snapshot:
+            self.snapshot(tag)
+        return result
+
+    def __del__(self):
+        try:
+            self.kill()
+        except Exception:
+            pass
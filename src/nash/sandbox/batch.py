@@ -0,0 +1,141 @@
+import base64
+import shlex
+
+from nash.sandbox.capture import BoundedCapture, ExecResult
+from nash.sandbox.usage import TIMES_PATTERN
+
+
+BATCH_MARKER = "__NASH_BATCH__"
+
+# Runs one script in a fresh temporary directory and subshell, storing its
+# output, exit code, timestamps and the CPU its children used in $B/<i>.*
+RUN_ONE = r"""
+__nash_run() {
+  local i=$1 d t0 t1 rc
+  d=$(mktemp -d)
+  times > "$B/$i.c0"
+  t0=$(date +%s%N)
+  ( cd "$d" && exec timeout -s KILL "$T" bash -c "$2" ) \
+    > "$B/$i.out" 2> "$B/$i.err" < /dev/null
+  rc=$?
+  t1=$(date +%s%N)
+  times > "$B/$i.c1"
+  echo "$rc $t0 $t1" > "$B/$i.rc"
+  rm -rf "$d"
+}
+"""
+
+# Prints one record per script as soon as it is done: a header line, then
+# base64 of the head and tail of its stdout and stderr, one per line.
+# Records are built in a file and printed whole under a mkdir lock, so
+# parallel scripts can't interleave them
+REPORT_ONE = r"""
+__nash_part() {
+  local f=$1 size
+  size=$(wc -c < "$f")
+  printf '%s ' "$size"
+  head -c "$H" "$f" | base64 -w0; printf ' '
+  if [ "$size" -gt "$H" ]; then
+    local rest=$((size - H))
+    tail -c $((rest < TL ? rest : TL)) "$f" | base64 -w0
+  fi
+  printf ' \n'
+}
+__nash_report() {
+  local i=$1
+  {
+    printf '%s %s %s ' "$M" "$i" "$(cat "$B/$i.rc")"
+    cat "$B/$i.c0" "$B/$i.c1" | tr '\n' ' '
+    printf '\n'
+    __nash_part "$B/$i.out"
+    __nash_part "$B/$i.err"
+  } > "$B/$i.rep"
+  until mkdir "$B/lock" 2>/dev/null; do sleep 0.01; done
+  cat "$B/$i.rep"
+  rmdir "$B/lock"
+}
+"""
+
+
+def batch_script(scripts, timeout, head, tail, parallel=1):
+    """
+    One bash script running every one of `scripts` and reporting on each.
+    """
+    lines = [
+        f"M={BATCH_MARKER}",
+        # GNU timeout takes fractions, and 0 would mean no limit at all
+        f"T={max(float(timeout), 0.001)}",
+        f"H={int(head)}",
+        f"TL={int(tail)}",
+        "B=$(mktemp -d)",
+        RUN_ONE,
+        REPORT_ONE,
+    ]
+
+    for i, script in enumerate(scripts):
+        if parallel > 1:
+            lines.append(
+                f'while [ "$(jobs -rp | wc -l)" -ge {int(parallel)} ]; '
+                "do wait -n; done"
+            )
+            lines.append(
+                f"{{ __nash_run {i} {shlex.quote(script)}; "
+                f"__nash_report {i}; }} &"
+            )
+        else:
+            lines.append(f"__nash_run {i} {shlex.quote(script)}")
+            lines.append(f"__nash_report {i}")
+
+    lines.append("wait")
+    lines.append('rm -rf "$B"')
+    return "\n".join(lines) + "\n"
+
+
+def parse_part(line, head, tail):
+    size, head_b64, tail_b64 = (line.split(" ") + ["", ""])[:3]
+    capture = BoundedCapture(head, tail)
+    capture.head = bytearray(base64.b64decode(head_b64))
+    capture.tail = bytearray(base64.b64decode(tail_b64))
+    capture.total = int(size)
+    return capture
+
+
+def parse_batch(stdout, scripts, head, tail):
+    """
+    Turn the driver's report back into one ExecResult per script, None
+    for any script it has no complete record of.
+    """
+    results = [None] * len(scripts)
+    lines = stdout.splitlines()
+    if not stdout.endswith("\n"):
+        # Cut off mid-line by a batch timeout
+        lines = lines[:-1]
+
+    for n, line in enumerate(lines):
+        if not line.startswith(BATCH_MARKER):
+            continue
+        if n + 2 >= len(lines):
+            break
+
+        fields = line.split()
+        index, returncode, start, end = (int(f) for f in fields[1:5])
+
+        cpu_time = None
+        times = [
+            int(m) * 60 + float(s)
+            for m, s in TIMES_PATTERN.findall(" ".join(fields[5:]))
+        ]
+        if len(times) == 8:
+            # Only the children lines: the subshells running the script
+            cpu_time = sum(times[6:8]) - sum(times[2:4])
+
+        results[index] = ExecResult(
+            scripts[index],
+            returncode,
+            parse_part(lines[n + 1], head, tail),
+            parse_part(lines[n + 2], head, tail),
+            wall_time=(end - start) / 1e9,
+            cpu_time=cpu_time,
+        )
+
+    return results
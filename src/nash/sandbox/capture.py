@@ -0,0 +1,248 @@
+import os
+import time
+import selectors
+import subprocess
+
+from nash.sandbox.usage import STATS_MARKER, parse_stats
+
+
+HEAD_BYTES = 16 * 1024
+TAIL_BYTES = 16 * 1024
+
+
+class BoundedCapture:
+    """
+    Keeps the first `head` and the last `tail` bytes of a stream and only
+    counts what falls in between, so memory stays bounded however much a
+    command prints.
+    """
+
+    def __init__(self, head=HEAD_BYTES, tail=TAIL_BYTES):
+        self.head_limit = head
+        self.tail_limit = tail
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total = 0
+
+    def feed(self, chunk):
+        self.total += len(chunk)
+
+        room = self.head_limit - len(self.head)
+        if room > 0:
+            self.head += chunk[:room]
+            chunk = chunk[room:]
+
+        if chunk and self.tail_limit > 0:
+            self.tail += chunk[-self.tail_limit:]
+            excess = len(self.tail) - self.tail_limit
+            if excess > 0:
+                del self.tail[:excess]
+
+    @property
+    def truncated(self):
+        return self.total > len(self.head) + len(self.tail)
+
+    def getvalue(self):
+        if not self.truncated:
+            return (self.head + self.tail).decode(errors="replace")
+
+        skipped = self.total - len(self.head) - len(self.tail)
+        return (
+            self.head.decode(errors="replace")
+            + f"\n[... {skipped} bytes truncated ...]\n"
+            + self.tail.decode(errors="replace")
+        )
+
+
+class TrailerCapture(BoundedCapture):
+    """
+    BoundedCapture that holds back the end of the stream, where the
+    sandbox appends a `marker` line that is not the command's output.
+    """
+
+    def __init__(self, marker, head=HEAD_BYTES, tail=TAIL_BYTES, keep=256):
+        super().__init__(head, tail)
+        self.marker = marker.encode()
+        self.keep = max(keep, len(self.marker) + 128)
+        self.window = bytearray()
+        self.trailer = None
+
+    def feed(self, chunk):
+        self.window += chunk
+        if len(self.window) > self.keep:
+            super().feed(self.window[:-self.keep])
+            del self.window[:-self.keep]
+
+    def close(self):
+        index = self.window.rfind(self.marker)
+        if index == -1:
+            super().feed(self.window)
+        else:
+            self.trailer = self.window[index + len(self.marker):].decode()
+            # Minus the newline printed ahead of the marker
+            super().feed(self.window[:max(index - 1, 0)])
+        self.window.clear()
+        return self.trailer
+
+
+class ExecResult(subprocess.CompletedProcess):
+    """
+    CompletedProcess whose stdout/stderr may have been truncated, with
+    the real sizes of both streams and what the command cost: wall and
+    CPU seconds and peak memory in bytes (None where unknown).
+    """
+
+    def __init__(
+        self,
+        args,
+        returncode,
+        stdout,
+        stderr,
+        wall_time=None,
+        cpu_time=None,
+        peak_rss=None,
+        container_peak=None,
+    ):
+        super().__init__(
+            args, returncode, stdout.getvalue(), stderr.getvalue()
+        )
+        self.stdout_bytes = stdout.total
+        self.stderr_bytes = stderr.total
+        self.truncated = stdout.truncated or stderr.truncated
+        self.wall_time = wall_time
+        self.cpu_time = cpu_time
+        self.peak_rss = peak_rss
+        self.container_peak = container_peak
+        self.rusage = None
+
+    @property
+    def output_bytes(self):
+        return self.stdout_bytes + self.stderr_bytes
+
+    def usage(self):
+        return {
+            "wall_time": self.wall_time,
+            "cpu_time": self.cpu_time,
+            "peak_rss": self.peak_rss,
+            "container_peak": self.container_peak,
+            "output_bytes": self.output_bytes,
+        }
+
+
+def run_bounded(
+    args,
+    timeout=None,
+    check=False,
+    input=None,
+    head=HEAD_BYTES,
+    tail=TAIL_BYTES,
+    stats=False,
+):
+    """
+    subprocess.run(..., capture_output=True) that streams both pipes into
+    BoundedCaptures instead of buffering them whole.
+
+    With `stats` the command is expected to end its stderr with the line
+    printed by usage.STATS_SCRIPT, which is parsed off into the result.
+    The process's own rusage is kept on the result either way.
+    """
+    start = time.monotonic()
+    deadline = None if timeout is None else start + timeout
+    proc = subprocess.Popen(
+        args,
+        stdin=subprocess.DEVNULL if input is None else subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    captures = {
+        proc.stdout: BoundedCapture(head, tail),
+        proc.stderr: (
+            TrailerCapture(STATS_MARKER, head, tail)
+            if stats
+            else BoundedCapture(head, tail)
+        ),
+    }
+
+    pending = memoryview(input or b"")
+
+    try:
+        with selectors.DefaultSelector() as selector:
+            for stream in captures:
+                selector.register(stream, selectors.EVENT_READ)
+            if input is not None:
+                # Fed through the selector too, so a process that prints
+                # before it has read all of its input can't deadlock us
+                os.set_blocking(proc.stdin.fileno(), False)
+                selector.register(proc.stdin, selectors.EVENT_WRITE)
+
+            while selector.get_map():
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise subprocess.TimeoutExpired(
+                            args,
+                            timeout,
+                            output=captures[proc.stdout].getvalue(),
+                        )
+
+                for key, _ in selector.select(remaining):
+                    if key.fileobj is proc.stdin:
+                        try:
+                            written = os.write(proc.stdin.fileno(), pending)
+                        except BrokenPipeError:
+                            written = len(pending)
+                        pending = pending[written:]
+                        if not pending:
+                            selector.unregister(proc.stdin)
+                            proc.stdin.close()
+                        continue
+
+                    chunk = os.read(key.fileobj.fileno(), 65536)
+                    if not chunk:
+                        selector.unregister(key.fileobj)
+                        continue
+                    captures[key.fileobj].feed(chunk)
+
+        rusage = wait_rusage(proc, deadline, args, timeout)
+    except BaseException:
+        proc.kill()
+        proc.wait()
+        raise
+    finally:
+        proc.stdout.close()
+        proc.stderr.close()
+
+    wall_time = time.monotonic() - start
+    cpu_time, container_peak = None, None
+    if stats:
+        cpu_time, container_peak = parse_stats(captures[proc.stderr].close())
+
+    result = ExecResult(
+        args,
+        proc.returncode,
+        captures[proc.stdout],
+        captures[proc.stderr],
+        wall_time=wall_time,
+        cpu_time=cpu_time,
+        container_peak=container_peak,
+    )
+    result.rusage = rusage
+    if check:
+        result.check_returncode()
+    return result
+
+
+def wait_rusage(proc, deadline, args, timeout):
+    """
+    proc.wait() that also returns the rusage of the process and of the
+    descendants it waited for.
+    """
+    while True:
+        pid, status, rusage = os.wait4(proc.pid, os.WNOHANG)
+        if pid == proc.pid:
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            return rusage
+        if deadline is not None and time.monotonic() >= deadline:
+            raise subprocess.TimeoutExpired(args, timeout)
+        time.sleep(0.001)
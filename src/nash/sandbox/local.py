@@ -0,0 +1,263 @@
+import os
+import shutil
+import tempfile
+import subprocess
+from pathlib import Path
+
+from nash.sandbox.base import BaseSandbox
+from nash.sandbox.capture import HEAD_BYTES, TAIL_BYTES
+
+
+SNAPSHOT_DIR = Path(tempfile.gettempdir()) / "nash_snapshots"
+
+USERNS = ["unshare", "--user", "--map-root-user"]
+
+# Top level dirs that start empty in the sandbox instead of showing the
+# host's (the `case` in PRELUDE lists them too)
+FRESH = ("tmp", "run", "root", "home")
+
+
+def hidden_paths():
+    """
+    Host paths to hide from the sandbox: the caller's home and this
+    package, whose env module holds the API keys. Those under a FRESH
+    dir are already out of sight.
+    """
+    paths = [os.path.expanduser("~"), str(Path(__file__).resolve().parents[1])]
+    return [
+        path for path in paths
+        if Path(path).parts[1:2] and Path(path).parts[1] not in FRESH
+    ]
+
+# Runs as root of fresh user/mount/pid namespaces. Builds a root out of
+# copy-on-write overlays of the host's top level directories, with the
+# upper layers in the scratch dir, and runs "$@" chrooted into it. Whatever
+# can't be overlaid (e.g. a dir with mounts below it) is bound read-only.
+#
+# The root itself is a dir in the scratch upper layer, so new top level
+# paths persist between commands and are part of snapshots. The FRESH
+# dirs start empty, and the `:` separated paths in $2 are covered with an
+# empty read-only tmpfs. That hides them from tasks; a root inside the
+# sandbox could unmount it, so it is no security boundary.
+#
+# /dev is built like bwrap's --dev: a tmpfs with only the harmless
+# character devices bound in, a private devpts and a private /dev/shm.
+# /sys is a read-only sysfs of the sandbox's own network namespace, or
+# left empty where that can't be mounted.
+PRELUDE = r"""
+S=$1; H=$2; shift 2
+R=$S/root
+mkdir -p "$S/upper/.root"
+mount --bind "$S/upper/.root" "$R" || exit 125
+for p in /*; do
+  n=${p#/}
+  if [ -L "$p" ]; then ln -sfn "$(readlink "$p")" "$R/$n"; continue; fi
+  [ -d "$p" ] || continue
+  mkdir -p "$R/$n"
+  case $n in
+    proc|sys|dev) ;;
+    tmp|run|root|home)
+      mkdir -p "$S/upper/$n"
+      mount --bind "$S/upper/$n" "$R/$n" || exit 125
+      ;;
+    *)
+      mkdir -p "$S/upper/$n" "$S/work/$n"
+      mount -t overlay overlay \
+        -o "lowerdir=$p,upperdir=$S/upper/$n,workdir=$S/work/$n" \
+        "$R/$n" 2>/dev/null ||
+      { mount --rbind "$p" "$R/$n" && mount -o remount,bind,ro "$R/$n"; } ||
+      exit 125
+      ;;
+  esac
+done
+set -f; IFS=:
+for h in $H; do
+  [ -d "$R$h" ] && mount -t tmpfs -o ro,size=4k tmpfs "$R$h"
+done
+set +f; unset IFS
+mount -t proc proc "$R/proc"
+mount -t tmpfs -o nosuid,mode=755 tmpfs "$R/dev" || exit 125
+for d in null zero full random urandom tty; do
+  touch "$R/dev/$d"
+  mount --bind "/dev/$d" "$R/dev/$d" || exit 125
+done
+mkdir "$R/dev/pts" "$R/dev/shm"
+mount -t devpts -o newinstance,ptmxmode=0666,mode=620 devpts "$R/dev/pts" &&
+  ln -s pts/ptmx "$R/dev/ptmx"
+mount -t tmpfs -o nosuid,nodev tmpfs "$R/dev/shm" || exit 125
+ln -s /proc/self/fd "$R/dev/fd"
+ln -s /proc/self/fd/0 "$R/dev/stdin"
+ln -s /proc/self/fd/1 "$R/dev/stdout"
+ln -s /proc/self/fd/2 "$R/dev/stderr"
+mount -t sysfs -o ro,nosuid,nodev,noexec sysfs "$R/sys" 2>/dev/null
+exec chroot "$R" /usr/bin/env -C /root HOME=/root "$@"
+"""
+
+
+class LocalSandbox(BaseSandbox):
+    """
+    Daemonless sandbox built on Linux namespaces (util-linux `unshare`).
+
+    Each command runs in new user, mount and pid (and by default network)
+    namespaces, chrooted into a copy-on-write view of the host whose
+    writes land in a per-sandbox scratch dir. Starting one is a mkdir.
+
+    The host filesystem is readable from inside, except /root, /home,
+    the caller's home and this package (see PRELUDE); don't keep secrets
+    elsewhere on a host that runs untrusted tasks.
+    """
+
+    rusage_peak = True
+
+    def __init__(
+        self,
+        session=False,
+        network=False,
+        scratch_dir=None,
+        head_bytes=HEAD_BYTES,
+        tail_bytes=TAIL_BYTES,
+        memory=None,
+    ):
+        super().__init__(
+            session=session, head_bytes=head_bytes, tail_bytes=tail_bytes
+        )
+        self.network = network
+        # No cgroup delegation to rely on here, so memory is an address
+        # space rlimit (bytes) on every process of the sandbox
+        self.memory = memory
+        self.scratch_dir = scratch_dir
+        self.scratch = None
+        self.init()
+
+    def init(self, image=None):
+        self.scratch = Path(
+            tempfile.mkdtemp(prefix="nash_", dir=self.scratch_dir)
+        )
+        (self.scratch / "work").mkdir()
+        (self.scratch / "root").mkdir()
+
+        if image is None:
+            (self.scratch / "upper").mkdir()
+        else:
+            # Inside the namespace, so overlay whiteouts can be copied
+            subprocess.run(
+                USERNS + [
+                    "cp",
+                    "-a",
+                    str(SNAPSHOT_DIR / image / "upper"),
+                    str(self.scratch / "upper"),
+                ],
+                capture_output=True,
+                check=True,
+                timeout=120,
+            )
+
+        self.dirty = False
+        return self.scratch
+
+    def kill(self):
+        self.close_shell()
+
+        if self.scratch is None:
+            return None
+
+        result = subprocess.run(
+            USERNS + ["rm", "-rf", str(self.scratch)],
+            capture_output=True,
+            check=False,
+            timeout=120,
+        )
+        self.scratch = None
+        return result
+
+    def _argv(self, args):
+        # --kill-child takes the whole pid namespace down with `unshare`
+        namespaces = USERNS + ["--mount", "--pid", "--fork", "--kill-child"]
+        if not self.network:
+            namespaces.append("--net")
+        if self.memory is not None:
+            namespaces = ["prlimit", f"--as={int(self.memory)}"] + namespaces
+        return namespaces + [
+            "bash",
+            "-c",
+            PRELUDE,
+            "prelude",
+            str(self.scratch),
+            ":".join(hidden_paths()),
+        ] + args
+
+    def shell_argv(self):
+        return self._argv(["bash", "-l"])
+
+    def command_argv(self, script):
+        return self._argv(["bash", "-lc", script])
+
+    def snapshot_key(self):
+        return "local"
+
+    def has_snapshot(self, tag):
+        return (SNAPSHOT_DIR / tag).is_dir()
+
+    def snapshot(self, tag):
+        """
+        Copy the scratch upper layer into the snapshot store.
+        """
+        SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(prefix=f"{tag}_", dir=SNAPSHOT_DIR))
+        result = subprocess.run(
+            USERNS + [
+                "cp",
+                "-a",
+                str(self.scratch / "upper"),
+                str(staging / "upper"),
+            ],
+            text=True,
+            capture_output=True,
+            check=True,
+            timeout=120,
+        )
+
+        try:
+            staging.rename(SNAPSHOT_DIR / tag)
+        except OSError:
+            # Someone else snapshotted the same setup first
+            subprocess.run(USERNS + ["rm", "-rf", str(staging)], check=False)
+
+        self.snapshot_image = tag
+        return result
+
+    def rollback(self, tag=None):
+        """
+        Replace the scratch dir with a copy of a snapshot.
+        """
+        tag = tag or self.snapshot_image
+        if tag is None:
+            return self.reset()
+
+        self.kill()
+        result = self.init(image=tag)
+        self.snapshot_image = tag
+        return result
+
+    def remove_snapshot(self, tag):
+        if (SNAPSHOT_DIR / tag).exists():
+            subprocess.run(
+                USERNS + ["rm", "-rf", str(SNAPSHOT_DIR / tag)],
+                check=False,
+            )
+        if self.snapshot_image == tag:
+            self.snapshot_image = None
+
+    @staticmethod
+    def remove_snapshots():
+        if SNAPSHOT_DIR.exists():
+            subprocess.run(
+                USERNS + ["rm", "-rf", str(SNAPSHOT_DIR)],
+                check=False,
+            )
+
+    @staticmethod
+    def available():
+        return shutil.which("unshare") is not None and subprocess.run(
+            USERNS + ["true"], capture_output=True, check=False
+        ).returncode == 0
@@ -0,0 +1,90 @@
+import queue
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from nash.sandbox.sandbox import Sandbox
+
+
+class SandboxPool:
+    """
+    Keeps `size` started sandboxes ready to hand out.
+
+    acquire() returns a ready sandbox, release() throws the used one away
+    and boots a replacement in the background, so callers only wait on
+    container startup when the pool has been drained.
+    """
+
+    def __init__(self, size=4, factory=Sandbox, max_workers=None):
+        self.size = size
+        self.factory = factory
+        self.ready = queue.Queue()
+        self.closed = False
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or size)
+
+        for _ in range(self.size):
+            self._replenish()
+
+    def _spawn(self):
+        try:
+            sandbox = self.factory()
+        except Exception as e:
+            # Hand the error to whoever is waiting instead of hanging them
+            self.ready.put(e)
+            return
+
+        with self.lock:
+            if not self.closed:
+                self.ready.put(sandbox)
+                return
+
+        sandbox.kill()
+
+    def _replenish(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.executor.submit(self._spawn)
+
+    def acquire(self, timeout=None):
+        item = self.ready.get(timeout=timeout)
+        if isinstance(item, Exception):
+            self._replenish()
+            raise item
+        return item
+
+    def release(self, sandbox):
+        with self.lock:
+            if self.closed:
+                sandbox.kill()
+                return
+            self.executor.submit(sandbox.kill)
+        self._replenish()
+
+    @contextmanager
+    def sandbox(self, timeout=None):
+        sandbox = self.acquire(timeout=timeout)
+        try:
+            yield sandbox
+        finally:
+            self.release(sandbox)
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+        self.executor.shutdown(wait=True)
+
+        while True:
+            try:
+                item = self.ready.get_nowait()
+            except queue.Empty:
+                break
+            if not isinstance(item, Exception):
+                item.kill()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,15 +1,59 @@
 import uuid
 import subprocess
 
+from nash.sandbox.base import BaseSandbox
+from nash.sandbox.capture import HEAD_BYTES, TAIL_BYTES
+from nash.sandbox.session import kill_tree_command
 
-class Sandbox:
-    def __init__(self, image="ubuntu:24.04"):
+
+SNAPSHOT_REPOSITORY = "nash-snapshot"
+
+
+def snapshot_ref(tag):
+    return f"{SNAPSHOT_REPOSITORY}:{tag}"
+
+
+def limit_flags(cpus=None, memory=None, pids=None):
+    """
+    `docker run` flags for the container's cgroup limits, e.g.
+    cpus=1.5, memory="512m", pids=256.
+    """
+    flags = []
+    if cpus is not None:
+        flags += ["--cpus", str(cpus)]
+    if memory is not None:
+        flags += ["--memory", str(memory)]
+    if pids is not None:
+        flags += ["--pids-limit", str(pids)]
+    return flags
+
+
+class Sandbox(BaseSandbox):
+    # Snapshot tags known to exist, shared by every sandbox in the process
+    snapshots = set()
+
+    def __init__(
+        self,
+        image="ubuntu:24.04",
+        session=False,
+        head_bytes=HEAD_BYTES,
+        tail_bytes=TAIL_BYTES,
+        cpus=None,
+        memory=None,
+        pids=None,
+    ):
+        super().__init__(
+            session=session, head_bytes=head_bytes, tail_bytes=tail_bytes
+        )
         self.image = image
+        self.limits = limit_flags(cpus, memory, pids)
         self.container_id = None
-        self.container_name = f"sandbox_{uuid.uuid4().hex[:8]}"
+        self.container_name = None
         self.init()
 
-    def init(self):
+    def init(self, image=None):
+        # A fresh name each time, `--rm` may still be removing the old one
+        self.container_name = f"sandbox_{uuid.uuid4().hex[:8]}"
         result = subprocess.run(
             [
                 "docker",
@@ -18,7 +62,8 @@ class Sandbox:
                 "--rm",
                 "--name",
                 self.container_name,
-                self.image,
+                *self.limits,
+                self.image if image is None else snapshot_ref(image),
                 "sleep",
                 "infinity",
             ],
@@ -30,11 +75,17 @@ class Sandbox:
 
         self.container_id = result.stdout.strip()
 
-        # Ensure bash exists (Ubuntu does, but defensive)
-        self.exec_shell("apt-get update -y", check=False)
+        # Snapshots were committed after this already ran
+        if image is None:
+            # Ensure bash exists (Ubuntu does, but defensive)
+            self.exec_shell("apt-get update -y", check=False)
+
+        self.dirty = False
         return result
 
     def kill(self):
+        self.close_shell()
+
         if not self.container_id:
             return None
 
@@ -46,36 +97,102 @@ class Sandbox:
             timeout=30,
         )
 
-    def reset(self):
-        self.kill()
-        return self.init()
+    def snapshot_key(self):
+        return self.image
 
-    def exec(self, args, **kwargs):
-        cmd = ["docker", "exec", self.container_id] + args
-        return subprocess.run(cmd, **kwargs)
+    def has_snapshot(self, tag):
+        if tag in Sandbox.snapshots:
+            return True
+
+        result = subprocess.run(
+            ["docker", "image", "inspect", snapshot_ref(tag)],
+            capture_output=True,
+            check=False,
+            timeout=30,
+        )
+        if result.returncode == 0:
+            Sandbox.snapshots.add(tag)
+            return True
+        return False
 
-    def exec_shell(self, command, timeout=30, check=False):
+    def snapshot(self, tag):
         """
-        Execute a full shell command inside the container.
-        Supports pipes, redirects, &&, etc.
+        Commit the current container filesystem as a snapshot image.
         """
-        return subprocess.run(
-            [
-                "docker",
-                "exec",
-                self.container_id,
-                "bash",
-                "-lc",
-                command,
-            ],
+        result = subprocess.run(
+            ["docker", "commit", self.container_id, snapshot_ref(tag)],
             text=True,
             capture_output=True,
-            timeout=timeout,
-            check=check,
+            check=True,
+            timeout=120,
+        )
+        Sandbox.snapshots.add(tag)
+        self.snapshot_image = tag
+        return result
+
+    def rollback(self, tag=None):
+        """
+        Replace the container with a fresh one started from a snapshot.
+        """
+        tag = tag or self.snapshot_image
+        if tag is None:
+            return self.reset()
+
+        self.kill()
+        result = self.init(image=tag)
+        self.snapshot_image = tag
+        return result
+
+    def remove_snapshot(self, tag):
+        subprocess.run(
+            ["docker", "image", "rm", "-f", snapshot_ref(tag)],
+            capture_output=True,
+            check=False,
+            timeout=120,
+        )
+        Sandbox.snapshots.discard(tag)
+        if self.snapshot_image == tag:
+            self.snapshot_image = None
+
+    @staticmethod
+    def remove_snapshots():
+        result = subprocess.run(
+            ["docker", "image", "ls", "-q", SNAPSHOT_REPOSITORY],
+            text=True,
+            capture_output=True,
+            check=False,
+            timeout=30,
         )
+        images = result.stdout.split()
+        if images:
+            subprocess.run(
+                ["docker", "image", "rm", "-f"] + images,
+                capture_output=True,
+                check=False,
+                timeout=120,
+            )
+        Sandbox.snapshots.clear()
+
+    def exec(self, args, **kwargs):
+        cmd = ["docker", "exec", self.container_id] + args
+        return subprocess.run(cmd, **kwargs)
+
+    def shell_argv(self):
+        return ["docker", "exec", "-i", self.container_id, "bash", "-l"]
+
+    def command_argv(self, script):
+        return [
+            "docker",
+            "exec",
+            self.container_id,
+            "bash",
+            "-lc",
+            script,
+        ]
 
-    def __del__(self):
-        try:
-            self.kill()
-        except Exception:
-            pass
+    def session_killer(self, pid):
+        return self.exec(
+            ["bash", "-c", kill_tree_command(pid)],
+            capture_output=True,
+            timeout=30,
+        )
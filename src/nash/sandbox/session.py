@@ -0,0 +1,189 @@
+import os
+import time
+import uuid
+import shlex
+import selectors
+import subprocess
+
+from nash.sandbox.capture import (
+    HEAD_BYTES,
+    TAIL_BYTES,
+    BoundedCapture,
+    TrailerCapture,
+    ExecResult,
+)
+from nash.sandbox.usage import STATS_SCRIPT, STATS_MARKER, parse_stats
+
+
+def kill_tree_command(pid):
+    """
+    Shell command killing `pid` and all of its descendants, using only
+    bash and /proc so it works in a bare image.
+    """
+    return (
+        "k() { for c in $(cat /proc/$1/task/*/children 2>/dev/null); "
+        "do k $c; done; kill -KILL $1 2>/dev/null; }; "
+        f"k {int(pid)}"
+    )
+
+class ShellSession:
+    """
+    A long-lived bash process driven over stdin/stdout.
+
+    Every command is wrapped so that its output is followed by a unique
+    sentinel (carrying the exit code on stdout), which lets us find where
+    one command ends without restarting the shell. cwd, variables and
+    functions therefore carry over between commands.
+    """
+
+    def __init__(self, argv, killer=None, head=HEAD_BYTES, tail=TAIL_BYTES):
+        self.argv = argv
+        self.killer = killer
+        self.head = head
+        self.tail = tail
+        self.proc = None
+        self.pid = None
+        # The shell's cumulative CPU seconds after the previous command
+        self.cpu_total = 0.0
+        self.start()
+
+    def start(self):
+        self.proc = subprocess.Popen(
+            self.argv,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            bufsize=0,
+        )
+        self.cpu_total = 0.0
+        # The shell's own pid, so a timed out command can be killed in place
+        result = self.run("echo $$", timeout=30)
+        self.pid = int(result.stdout.strip())
+
+    def alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def close(self):
+        if self.proc is None:
+            return
+        try:
+            self.proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.proc.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            self.proc.wait()
+        self.proc = None
+        self.pid = None
+
+    def _script(self, command, marker):
+        return (
+            f"eval {shlex.quote(command)} < /dev/null\n"
+            "__nash_rc=$?\n"
+            f"{STATS_SCRIPT}\n"
+            f"printf '%s %d\\n' {marker} $__nash_rc\n"
+            f"printf '%s\\n' {marker} >&2\n"
+        ).encode()
+
+    def _read(self, marker, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        streams = (self.proc.stdout, self.proc.stderr)
+        captures = {
+            self.proc.stdout: BoundedCapture(self.head, self.tail),
+            self.proc.stderr: TrailerCapture(
+                STATS_MARKER, self.head, self.tail
+            ),
+        }
+        # Unconsumed bytes that may still hold (part of) the marker line
+        windows = {stream: bytearray() for stream in streams}
+        trailers = {}
+        keep = len(marker) + 16
+
+        with selectors.DefaultSelector() as selector:
+            for stream in streams:
+                selector.register(stream, selectors.EVENT_READ)
+
+            while selector.get_map():
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+
+                for key, _ in selector.select(remaining):
+                    stream = key.fileobj
+                    chunk = os.read(stream.fileno(), 65536)
+                    window = windows[stream]
+                    if not chunk:
+                        # Shell exited (e.g. the command ran `exit`)
+                        captures[stream].feed(window)
+                        selector.unregister(stream)
+                        continue
+
+                    window += chunk
+                    index = window.find(marker)
+                    if index != -1 and b"\n" in window[index:]:
+                        captures[stream].feed(window[:index])
+                        trailers[stream] = bytes(window[index + len(marker):])
+                        selector.unregister(stream)
+                    elif index == -1 and len(window) > keep:
+                        captures[stream].feed(window[:-keep])
+                        del window[:-keep]
+
+        stdout, stderr = streams
+        return captures[stdout], captures[stderr], trailers.get(stdout)
+
+    def run(self, command, timeout=30, check=False):
+        start = time.monotonic()
+        marker = f"__NASH_{uuid.uuid4().hex}__".encode()
+
+        self.proc.stdin.write(self._script(command, marker.decode()))
+        result = self._read(marker, timeout)
+
+        if result is None:
+            self.interrupt()
+            raise subprocess.TimeoutExpired(command, timeout)
+
+        stdout, stderr, trailer = result
+        cpu_time, container_peak = parse_stats(stderr.close())
+        if trailer is not None:
+            returncode = int(trailer.split()[0])
+        else:
+            # The shell is gone, so its exit status is the command's
+            returncode = self.proc.wait()
+            self.proc = None
+            self.pid = None
+
+        if cpu_time is not None:
+            cpu_time, self.cpu_total = cpu_time - self.cpu_total, cpu_time
+
+        completed = ExecResult(
+            command,
+            returncode,
+            stdout,
+            stderr,
+            wall_time=time.monotonic() - start,
+            cpu_time=cpu_time,
+            container_peak=container_peak,
+        )
+        if check:
+            completed.check_returncode()
+        return completed
+
+    def interrupt(self):
+        """
+        Kill whatever the timed out command left running, then drop the
+        shell so the next command starts from a clean session.
+        """
+        if self.killer is not None and self.pid is not None:
+            try:
+                self.killer(self.pid)
+            except Exception:
+                pass
+        if self.proc is not None:
+            self.proc.kill()
+            self.proc.wait()
+        self.proc = None
+        self.pid = None
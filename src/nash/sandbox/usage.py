@@ -0,0 +1,55 @@
+import re
+import shlex
+
+
+STATS_MARKER = "__NASH_STATS__"
+
+# Run by the sandbox's shell after the command. Prints on stderr the
+# shell's cumulative CPU times (`times`: self user/sys, children user/sys,
+# which must run in the shell itself, not a pipeline) and the memory
+# high-water mark of the sandbox's cgroup. That mark covers the whole
+# container lifetime, init and earlier commands included: a write to
+# memory.peak only resets it for the writer's open file, so it can't be
+# scoped to one command.
+STATS_SCRIPT = (
+    f"printf '\\n%s ' {STATS_MARKER} >&2; "
+    "times >&2; "
+    "{ cat /sys/fs/cgroup/memory.peak "
+    "|| cat /sys/fs/cgroup/memory/memory.max_usage_in_bytes "
+    "|| echo -; } 2>/dev/null >&2"
+)
+
+TIMES_PATTERN = re.compile(r"(\d+)m([\d.]+)s")
+
+
+def wrap_command(command):
+    """
+    Script for `bash -c` that runs `command` and then reports its usage,
+    from an EXIT trap so that commands calling `exit` are measured too.
+    """
+    return (
+        f"trap {shlex.quote(STATS_SCRIPT)} EXIT\n"
+        f"eval {shlex.quote(command)}"
+    )
+
+
+def parse_stats(trailer):
+    """
+    Parse what STATS_SCRIPT printed after its marker into
+    (cumulative cpu seconds, container peak memory bytes), either may be
+    None.
+    """
+    if trailer is None:
+        return None, None
+
+    cpu_time = None
+    times = TIMES_PATTERN.findall(trailer)
+    if times:
+        cpu_time = sum(int(m) * 60 + float(s) for m, s in times)
+
+    container_peak = None
+    fields = trailer.split()
+    if fields and fields[-1].isdigit():
+        container_peak = int(fields[-1])
+
+    return cpu_time, container_peak
@@ -1,10 +1,10 @@
 import csv
-import json
-import time
 from dataclasses import dataclass
 from typing import Dict, Any
 
 from nash.clients.json_client import JSONClient
+from nash.clients.retry import RetryPolicy
+from nash.dataset.writer import JSONLWriter
 
 
 MAX_RETRY_COUNT = 100
@@ -121,8 +121,11 @@ class CSVRow:
 
 
 class CSVToJSONLConverter:
-    def __init__(self):
-        self.client = JSONClient(
+    def __init__(self, client_factory=JSONClient, retry: RetryPolicy = None):
+        self.retry = retry or RetryPolicy(
+            max_attempts=MAX_RETRY_COUNT, honor_retry_after=False
+        )
+        self.client = client_factory(
             model_name=MODEL_NAME,
             system_prompt=SYSTEM_PROMPT,
             json_schema=TASK_JSON_SCHEMA,
@@ -147,7 +150,7 @@ class CSVToJSONLConverter:
         idx = 0
         rows = self.read_csv(csv_path)
 
-        with open(output_path, "w") as out_f:
+        with JSONLWriter(output_path, append=False) as writer:
             for row in rows:
                 idx += 1
                 print("Generating: ", idx)
@@ -158,20 +161,21 @@ class CSVToJSONLConverter:
                     equivalent=row.equivalent.strip(),
                 )
 
-                for i in range(MAX_RETRY_COUNT):
-                    try:
-                        obj = self.client.generate_once(prompt)
-                    except Exception as err:
-                        print("Retrying: ", idx)
-                        print("Exception: ", err)
-                        time.sleep(3)
-                    else:
-                        break
+                def on_retry(err, attempt, delay):
+                    print("Retrying: ", idx)
+                    print("Exception: ", err)
 
-                out_f.write(json.dumps(obj))
-                out_f.write("\n")
+                try:
+                    obj = self.retry.call(
+                        self.client.generate_once, prompt, on_retry=on_retry
+                    )
+                except Exception as err:
+                    # A null line marks the row as failed, readers skip it
+                    print("Failed: ", idx)
+                    print("Exception: ", err)
+                    obj = None
 
-                time.sleep(3)
+                writer.write(obj)
 
         return True
 
@@ -0,0 +1,58 @@
+import os
+import gc
+import asyncio
+import logging
+import subprocess
+
+import pytest
+
+from nash.sandbox.async_sandbox import AsyncSandbox
+
+
+FAKE_DOCKER = """#!/bin/bash
+# `docker exec <id> cmd...` runs cmd on the host
+[ "$1" = exec ] && { shift 2; exec "$@"; }
+exit 0
+"""
+
+
+@pytest.fixture
+def sandbox(tmp_path, monkeypatch):
+    docker = tmp_path / "docker"
+    docker.write_text(FAKE_DOCKER)
+    docker.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tmp_path}:{os.environ['PATH']}")
+    sandbox = AsyncSandbox()
+    sandbox.container_id = "fake"
+    return sandbox
+
+
+def test_exec_shell(sandbox):
+    result = asyncio.run(sandbox.exec_shell("echo hi"))
+    assert result.returncode == 0
+    assert result.stdout == "hi\n"
+
+
+def test_timeout_leaves_no_unretrieved_future(sandbox, caplog):
+    async def run():
+        with pytest.raises(subprocess.TimeoutExpired):
+            await sandbox.exec_shell("sleep 5", timeout=0.5)
+
+    with caplog.at_level(logging.ERROR, logger="asyncio"):
+        asyncio.run(run())
+        gc.collect()
+    assert "never retrieved" not in caplog.text
+
+
+def test_cancel_leaves_no_unretrieved_future(sandbox, caplog):
+    async def run():
+        task = asyncio.create_task(sandbox.exec_shell("sleep 5"))
+        await asyncio.sleep(0.5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    with caplog.at_level(logging.ERROR, logger="asyncio"):
+        asyncio.run(run())
+        gc.collect()
+    assert "never retrieved" not in caplog.text
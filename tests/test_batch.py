@@ -0,0 +1,79 @@
+import pytest
+
+from nash.sandbox.batch import batch_script, parse_batch
+from nash.sandbox.local import LocalSandbox
+
+
+needs_sandbox = pytest.mark.skipif(
+    not LocalSandbox.available(), reason="needs unprivileged unshare"
+)
+
+
+@pytest.fixture
+def sandbox():
+    sandbox = LocalSandbox()
+    yield sandbox
+    sandbox.kill()
+
+
+def test_fractional_timeout_is_kept():
+    assert "T=0.5\n" in batch_script(["true"], 0.5, 10, 10)
+    assert "T=0.001\n" in batch_script(["true"], 0, 10, 10)
+
+
+def test_parse_batch_drops_a_cut_off_record():
+    stdout = (
+        "__NASH_BATCH__ 0 0 0 1000000000 0m0s 0m0s 0m0s 0m0s\n"
+        "3 aGkK  \n"
+        "0   \n"
+        "__NASH_BATCH__ 1 0 0 1000000000 0m0s 0m0s 0m0s 0m0s\n"
+        "3 aGkK  \n"
+        "0 "
+    )
+    results = parse_batch(stdout, ["echo hi", "echo hi"], 10, 10)
+    assert results[0].stdout == "hi\n"
+    assert results[0].wall_time == 1.0
+    assert results[1] is None
+
+
+def test_parse_batch_reads_records_in_any_order():
+    # `times` before and after: shell user/sys, then children user/sys
+    stdout = (
+        "__NASH_BATCH__ 1 2 0 500000000 0m0.1s 0m0.1s 0m1.0s 0m0.5s "
+        "0m0.1s 0m0.1s 0m3.0s 0m1.5s\n"
+        "12 MDEyMw== ODliCg== \n"
+        "0   \n"
+    )
+    results = parse_batch(stdout, ["a", "b", "c"], 4, 4)
+    assert results[0] is None and results[2] is None
+    result = results[1]
+    assert result.args == "b"
+    assert result.returncode == 2
+    assert result.wall_time == 0.5
+    # The children's CPU between the two `times`
+    assert result.cpu_time == pytest.approx(3.0)
+    assert result.truncated
+    assert result.stdout == "0123\n[... 4 bytes truncated ...]\n89b\n"
+    assert result.stderr == ""
+
+
+@needs_sandbox
+def test_sub_second_timeout_kills(sandbox):
+    [result] = sandbox.exec_batch(["sleep 5"], timeout=0.5)
+    assert result.returncode == 137
+    assert result.wall_time < 3
+
+
+@needs_sandbox
+@pytest.mark.parametrize("parallel", [1, 2])
+def test_batch_timeout_returns_partial_results(sandbox, parallel):
+    results = sandbox.exec_batch(
+        ["echo one", "echo two", "sleep 30", "echo four"],
+        timeout=60,
+        parallel=parallel,
+        batch_timeout=3,
+    )
+    assert [r.stdout for r in results[:2]] == ["one\n", "two\n"]
+    assert results[2] is None
+    if parallel == 1:
+        assert results[3] is None
@@ -0,0 +1,74 @@
+import os
+import json
+
+import pytest
+
+from nash.clients.cache import ResponseCache, CacheMiss, request_key
+
+
+FIELDS = {"model": "m", "messages": [{"role": "user", "content": "hi"}]}
+
+
+def counting(response):
+    calls = []
+
+    def request():
+        calls.append(1)
+        return response
+
+    return request, calls
+
+
+def test_readwrite_serves_what_it_stored(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    request, calls = counting("hello")
+    assert cache.lookup(FIELDS, request) == "hello"
+    assert cache.lookup(FIELDS, request) == "hello"
+    assert len(calls) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_replay_never_requests(tmp_path):
+    ResponseCache(str(tmp_path)).put(request_key(**FIELDS), "hello")
+    cache = ResponseCache(str(tmp_path), mode="replay")
+    request, calls = counting("other")
+    assert cache.lookup(FIELDS, request) == "hello"
+    with pytest.raises(CacheMiss):
+        cache.lookup({**FIELDS, "sample": 1}, request)
+    assert calls == []
+
+
+def test_bypass_neither_reads_nor_writes(tmp_path):
+    cache = ResponseCache(str(tmp_path), mode="bypass")
+    request, calls = counting("hello")
+    cache.lookup(FIELDS, request)
+    cache.lookup(FIELDS, request)
+    assert len(calls) == 2
+    assert list(cache.entries()) == []
+
+
+def test_rejected_reply_is_not_stored(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    request, calls = counting("{truncated")
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            cache.lookup(FIELDS, request, parse=json.loads)
+    assert len(calls) == 2
+    assert list(cache.entries()) == []
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_bytes=300)
+    keys = [request_key(n=n) for n in range(3)]
+    cache.put(keys[0], "x" * 100)
+    os.utime(cache.entry_path(keys[0]), (1, 1))
+    cache.put(keys[1], "x" * 100)
+    os.utime(cache.entry_path(keys[1]), (2, 2))
+    # A hit makes keys[0] the most recently used
+    assert cache.get(keys[0]) is not None
+    cache.put(keys[2], "x" * 100)
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[2]) is not None
+    assert cache.size <= 300
@@ -0,0 +1,70 @@
+import pytest
+
+from nash.sandbox.capture import BoundedCapture, TrailerCapture
+from nash.sandbox.session import ShellSession
+from nash.sandbox.usage import STATS_MARKER, parse_stats
+
+
+def test_bounded_capture_keeps_head_and_tail():
+    capture = BoundedCapture(head=4, tail=4)
+    for chunk in (b"0123", b"4567", b"89ab"):
+        capture.feed(chunk)
+    assert capture.truncated
+    assert capture.getvalue() == "0123\n[... 4 bytes truncated ...]\n89ab"
+
+
+def test_parse_stats():
+    trailer = " 0m0.010s 0m0.020s\n0m1.000s 0m0.500s\n12345\n"
+    cpu_time, peak = parse_stats(trailer)
+    assert cpu_time == pytest.approx(1.53)
+    assert peak == 12345
+    assert parse_stats(" 0m0s 0m0s\n0m0s 0m0s\n-\n")[1] is None
+    assert parse_stats(None) == (None, None)
+
+
+@pytest.mark.parametrize("size", [1, 7, 4096])
+def test_trailer_is_split_off_the_stream(size):
+    stream = (
+        b"x" * 1000 + b"\n" + STATS_MARKER.encode()
+        + b" 0m0s 0m0s\n0m2s 0m1s\n42\n"
+    )
+    capture = TrailerCapture(STATS_MARKER, head=64, tail=64)
+    for start in range(0, len(stream), size):
+        capture.feed(stream[start:start + size])
+    assert parse_stats(capture.close()) == (3.0, 42)
+    assert capture.total == 1000
+
+
+def test_stream_without_trailer_is_kept_whole():
+    capture = TrailerCapture(STATS_MARKER)
+    capture.feed(b"no stats here\n")
+    assert capture.close() is None
+    assert capture.getvalue() == "no stats here\n"
+
+
+@pytest.fixture
+def session():
+    session = ShellSession(["bash", "--norc", "--noprofile"])
+    yield session
+    session.close()
+
+
+def test_session_finds_the_end_of_each_command(session):
+    result = session.run("printf 'no newline'; echo oops >&2; false")
+    assert result.stdout == "no newline"
+    assert result.stderr == "oops\n"
+    assert result.returncode == 1
+
+    # Marker-like output doesn't end the command early
+    result = session.run("echo __NASH_; echo " + STATS_MARKER + "; echo end")
+    assert result.stdout == f"__NASH_\n{STATS_MARKER}\nend\n"
+
+
+def test_session_keeps_shell_state(session):
+    session.run("cd /tmp && X=1")
+    assert session.run("echo $X $PWD").stdout == "1 /tmp\n"
+
+
+def test_exit_ends_the_session(session):
+    assert session.run("exit 3").returncode == 3
+    assert not session.alive()
@@ -0,0 +1,103 @@
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+
+from nash.clients.constrained import SchemaGrammar  # noqa: E402
+
+
+SCHEMA = {
+    "name": "answer",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "name": {"type": "string"},
+            "count": {"type": "integer", "minimum": 0, "maximum": 12},
+            "done": {"type": "boolean"},
+            "tags": {"type": "array", "items": {"enum": ["a", "b"]}},
+        },
+    },
+}
+
+
+class Tokenizer:
+    """
+    Just enough of a Hugging Face tokenizer: one token per vocab entry,
+    the last one being EOS.
+    """
+
+    def __init__(self, vocab):
+        self.vocab = list(vocab) + ["</s>"]
+        self.eos_token_id = len(self.vocab) - 1
+        self.all_special_ids = [self.eos_token_id]
+
+    def __len__(self):
+        return len(self.vocab)
+
+    def decode(self, ids):
+        return "".join(self.vocab[i] for i in ids)
+
+    def convert_ids_to_tokens(self, token_id):
+        return self.vocab[token_id]
+
+
+VOCAB = [
+    '{"', "name", '":', '"', "hi", ' "', '\\"', ",", "count", "1", "2",
+    "13", "done", "true", "tags", "[", "]", '"a"', '"c"', "}", " ",
+]
+
+
+@pytest.fixture
+def grammar():
+    return SchemaGrammar(Tokenizer(VOCAB), SCHEMA)
+
+
+def test_accepts_canonical_documents(grammar):
+    states = grammar.consume(
+        grammar.start,
+        '{"name":"hi \\"x\\"","count":12,"done":true,"tags":["a","b"]}',
+    )
+    assert grammar.is_final(states)
+    states = grammar.consume(
+        grammar.start, '{"name":"","count":0,"done":false,"tags":[]}'
+    )
+    assert grammar.is_final(states)
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        '{ "name"',
+        '{"count":1',
+        '{"name":"hi","count":13',
+        '{"name":"hi","count":01',
+        '{"name":"hi","count":1,"done":true,"tags":["c"',
+    ],
+)
+def test_rejects_what_the_schema_does_not_allow(grammar, text):
+    assert not grammar.consume(grammar.start, text)
+
+
+def test_allowed_tokens_follow_the_automaton(grammar):
+    ids = {text: i for i, text in enumerate(VOCAB)}
+    assert grammar.allowed(grammar.start) == [ids['{"']]
+
+    states = grammar.consume(grammar.start, '{"name":"')
+    allowed = set(grammar.allowed(states))
+    # Anything can go inside a string, but only a quote ends it
+    assert {ids["hi"], ids[" "], ids['\\"'], ids['"']} <= allowed
+    assert ids['"a"'] not in allowed
+
+    states = grammar.consume(grammar.start, '{"name":"hi","count":1')
+    allowed = set(grammar.allowed(states))
+    assert {ids["2"], ids[","]} <= allowed
+    assert ids["13"] not in allowed
+
+
+def test_only_eos_follows_a_finished_document(grammar):
+    states = grammar.consume(
+        grammar.start, '{"name":"","count":0,"done":true,"tags":[]}'
+    )
+    assert grammar.allowed(states) == grammar.eos_ids
+    assert grammar.advance(states, grammar.eos_ids[0]) == states
@@ -0,0 +1,36 @@
+from nash.generation.dedup import NearDuplicateIndex
+
+
+TEXT = "Find every .log file under /var/log larger than 1 MB and list it."
+
+
+def test_near_duplicates_are_caught():
+    index = NearDuplicateIndex()
+    assert not index.check_and_add(TEXT)
+    assert index.check_and_add(TEXT + " Sort by size.")
+    assert not index.check_and_add("Count the users in /etc/passwd.")
+    assert len(index) == 2
+
+
+def test_capacity_evicts_oldest():
+    index = NearDuplicateIndex(capacity=2)
+    index.add(TEXT)
+    index.add("Count the users in /etc/passwd.")
+    index.add("Compress /srv/backup into backup.tar.gz.")
+    assert len(index) == 2
+    assert not index.is_duplicate(TEXT)
+    assert sum(len(buckets) for buckets in index.buckets) <= 2 * index.bands
+
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "index.dedup")
+    index = NearDuplicateIndex()
+    index.add(TEXT)
+    index.save(path, stamp=3)
+
+    loaded = NearDuplicateIndex()
+    assert loaded.load(path, stamp=3)
+    assert loaded.is_duplicate(TEXT)
+
+    assert not NearDuplicateIndex().load(path, stamp=4)
+    assert not NearDuplicateIndex(seed=1).load(path, stamp=3)
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+from nash.bench.fakes import FakeJSONClient, FakeSandbox
+from nash.generation.evaluate import Evaluator
+
+
+TASK = {
+    "difficulty": 1,
+    "description": "Create /tmp/done.",
+    "setup_command": "mkdir -p /tmp/work",
+    "success_condition": "test -f /tmp/done",
+}
+
+
+class SnapshotSandbox(FakeSandbox):
+    """
+    Records which setups asked for a snapshot and which were removed.
+    """
+
+    snapshotted = []
+    removed = []
+
+    def prepare(self, setup_command, timeout=30, snapshot=False):
+        if snapshot:
+            SnapshotSandbox.snapshotted.append(setup_command)
+        return super().prepare(setup_command, timeout, snapshot)
+
+    def remove_snapshot(self, tag):
+        SnapshotSandbox.removed.append(tag)
+
+
+@pytest.mark.parametrize("attempts", [1, 3])
+def test_snapshots_only_for_repeated_attempts(tmp_path, attempts):
+    SnapshotSandbox.snapshotted = []
+    SnapshotSandbox.removed = []
+    task_path = tmp_path / "tasks.jsonl"
+    task_path.write_text(json.dumps(TASK) + "\n")
+
+    evaluator = Evaluator(
+        str(task_path),
+        str(tmp_path / "results.jsonl"),
+        attempts=attempts,
+        workers=1,
+        sandbox_factory=SnapshotSandbox,
+        max_steps=1,
+        client_factory=FakeJSONClient,
+    )
+    report = evaluator.run()
+
+    assert report["attempts"] == attempts
+    if attempts == 1:
+        assert SnapshotSandbox.snapshotted == []
+        assert SnapshotSandbox.removed == []
+    else:
+        assert SnapshotSandbox.snapshotted
+        assert SnapshotSandbox.removed == [TASK["setup_command"]]
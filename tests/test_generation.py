@@ -0,0 +1,71 @@
+import json
+
+from nash.generation.generation import Generator
+
+
+SEED = {
+    "difficulty_level": 1,
+    "task": "Count the lines in /tmp/log.txt.",
+    "setup_commands": ["echo hi > /tmp/log.txt"],
+    "success_condition": ["test -f /tmp/count"],
+}
+
+REPLY = {
+    "difficulty_level": 2,
+    "task": "List the files in /tmp/data.",
+    "setup_commands": ["mkdir -p /tmp/data"],
+    "success_condition": ["test -f /tmp/list"],
+}
+
+
+class SameReplyClient:
+    """
+    Answers every prompt with the same task.
+    """
+
+    def __init__(self, model_name, system_prompt, json_schema):
+        pass
+
+    def generate_once(self, input_text, sample=None):
+        return dict(REPLY)
+
+
+def test_identical_tasks_are_written_once(tmp_path):
+    seed_path = tmp_path / "seeds.jsonl"
+    seed_path.write_text(json.dumps(SEED) + "\n" + json.dumps(SEED) + "\n")
+    task_path = tmp_path / "tasks.jsonl"
+
+    generator = Generator(
+        str(seed_path),
+        str(task_path),
+        multiplier=2,
+        client_factory=SameReplyClient,
+    )
+    generator.generate()
+    generator.close()
+
+    lines = task_path.read_text().splitlines()
+    assert len(lines) == 1
+    assert json.loads(lines[0])["description"] == REPLY["task"]
+    assert len(generator.dedup) == 1
+
+
+def test_duplicate_index_is_saved_for_the_next_run(tmp_path):
+    seed_path = tmp_path / "seeds.jsonl"
+    seed_path.write_text(json.dumps(SEED) + "\n" + json.dumps(SEED) + "\n")
+    task_path = tmp_path / "tasks.jsonl"
+
+    generator = Generator(
+        str(seed_path), str(task_path), client_factory=SameReplyClient
+    )
+    generator.multiplier = 1
+    generator.generate()
+    generator.close()
+
+    # Loaded from the saved index, not rebuilt from the task file
+    task_path.write_text("")
+    generator = Generator(
+        str(seed_path), str(task_path), client_factory=SameReplyClient
+    )
+    assert len(generator.dedup) == 1
+    generator.close()
@@ -0,0 +1,94 @@
+import time
+
+import pytest
+
+from nash.clients.key_rotate import (
+    APIKeyRotator,
+    NoKeyAvailable,
+    TokenBucket,
+    parse_duration,
+)
+
+
+def test_parse_duration():
+    assert parse_duration("2m59.56s") == pytest.approx(179.56)
+    assert parse_duration("120ms") == pytest.approx(0.12)
+    assert parse_duration("7") == 7.0
+    assert parse_duration("soon") is None
+    assert parse_duration(None) is None
+
+
+def test_token_bucket_refills_over_its_window():
+    bucket = TokenBucket(2, window=60)
+    now = bucket.stamp
+    bucket.take(1)
+    bucket.take(1)
+    assert bucket.ready_at(1, now) == pytest.approx(now + 30)
+    bucket.refill(now + 30)
+    assert bucket.ready_at(1, now + 30) == now + 30
+
+
+def test_unlimited_bucket_is_always_ready():
+    bucket = TokenBucket()
+    bucket.take(10 ** 9)
+    assert bucket.ready_at(10 ** 9, 5.0) == 5.0
+
+
+def test_keys_rotate_until_exhausted():
+    rotator = APIKeyRotator(["a", "b"], requests_per_minute=1)
+    assert [rotator.get_key(), rotator.get_key()] == ["a", "b"]
+    key, wait = rotator._reserve(0)
+    assert key is None
+    assert 0 < wait <= 60
+
+
+def test_daily_request_headers_leave_the_minute_bucket_alone():
+    rotator = APIKeyRotator(["a"], requests_per_minute=30)
+    rotator.update(
+        "a",
+        {
+            "x-ratelimit-limit-requests": "14400",
+            "x-ratelimit-remaining-requests": "14399",
+            "x-ratelimit-reset-requests": "6s",
+        },
+    )
+    state = rotator.states["a"]
+    assert state.requests.capacity == 30
+    assert state.blocked_until == 0
+
+
+def test_no_requests_left_benches_the_key():
+    rotator = APIKeyRotator(["a", "b"])
+    rotator.update(
+        "a",
+        {
+            "x-ratelimit-remaining-requests": "0",
+            "x-ratelimit-reset-requests": "2m",
+        },
+    )
+    assert rotator.states["a"].blocked_until > time.monotonic() + 100
+    assert {rotator.get_key() for _ in range(3)} == {"b"}
+
+
+def test_tokens_headers_sync_the_tokens_bucket():
+    rotator = APIKeyRotator(["a"], tokens_per_minute=1000)
+    rotator.update(
+        "a",
+        {
+            "x-ratelimit-limit-tokens": "6000",
+            "x-ratelimit-remaining-tokens": "100",
+            "x-ratelimit-reset-tokens": "59s",
+        },
+    )
+    tokens = rotator.states["a"].tokens
+    assert tokens.capacity == 6000
+    assert tokens.level == 100
+    assert tokens.rate == pytest.approx(100)
+
+
+def test_request_that_can_never_fit_raises():
+    rotator = APIKeyRotator(["a"])
+    rotator.states["a"].tokens = TokenBucket(100, rate=0)
+    rotator.states["a"].tokens.take(100)
+    with pytest.raises(NoKeyAvailable):
+        rotator.get_key(50)
@@ -0,0 +1,43 @@
+import os
+import uuid
+
+import pytest
+
+from nash.sandbox.local import LocalSandbox
+
+
+pytestmark = pytest.mark.skipif(
+    not LocalSandbox.available(), reason="needs unprivileged unshare"
+)
+
+
+@pytest.fixture
+def sandbox():
+    sandbox = LocalSandbox()
+    yield sandbox
+    sandbox.kill()
+
+
+def test_dev_shm_is_private(sandbox):
+    name = f"nash_probe_{uuid.uuid4().hex[:8]}"
+    result = sandbox.exec_shell(f"echo hi > /dev/shm/{name} && ls /dev/shm")
+    assert result.returncode == 0
+    assert name in result.stdout
+    assert not os.path.exists(f"/dev/shm/{name}")
+
+
+def test_dev_has_only_basic_devices(sandbox):
+    result = sandbox.exec_shell("ls /dev")
+    devices = set(result.stdout.split())
+    assert {"null", "zero", "urandom", "tty", "pts", "shm"} <= devices
+    assert not devices & {"kmsg", "kvm", "loop0", "mem", "sda"}
+
+
+def test_sys_is_read_only(sandbox):
+    result = sandbox.exec_shell("touch /sys/nash_probe")
+    assert result.returncode != 0
+
+
+def test_new_top_level_paths_persist(sandbox):
+    sandbox.exec_shell("mkdir /nash_data && echo 1 > /nash_data/f")
+    assert sandbox.exec_shell("cat /nash_data/f").stdout == "1\n"
@@ -0,0 +1,27 @@
+import pytest
+
+from nash.dataset.reader import JSONLReader
+from nash.dataset.writer import JSONLWriter
+
+
+def test_reads_shard_directory(tmp_path):
+    path = tmp_path / "tasks"
+    with JSONLWriter(str(path), buffer_bytes=1, shard_bytes=64) as writer:
+        for index in range(20):
+            writer.write({"index": index})
+        writer.write(None)
+
+    with JSONLReader(str(path)) as reader:
+        assert len(reader.shards) > 1
+        assert len(reader) == 20
+        assert [record["index"] for record in reader] == list(range(20))
+        assert reader[-1] == {"index": 19}
+
+
+def test_rejects_compressed_shards(tmp_path):
+    path = tmp_path / "tasks"
+    with JSONLWriter(str(path), shard_bytes=64, compress=True) as writer:
+        writer.write({"index": 0})
+
+    with pytest.raises(ValueError, match="compressed"):
+        JSONLReader(str(path))
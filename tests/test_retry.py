@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+
+import pytest
+
+from nash.clients.retry import (
+    RetryPolicy,
+    RetriesExhausted,
+    is_outage,
+    is_transient,
+)
+
+
+class StatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(status_code)
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+def failing(err):
+    calls = []
+
+    def fn():
+        calls.append(1)
+        raise err
+
+    return fn, calls
+
+
+def test_only_outages_are_outages():
+    assert is_outage(StatusError(503))
+    assert is_outage(StatusError(408))
+    assert is_outage(ConnectionResetError())
+    assert is_outage(TimeoutError())
+    assert not is_outage(StatusError(429))
+    assert not is_outage(ValueError("bad JSON"))
+    assert is_transient(StatusError(429))
+    assert not is_transient(StatusError(400))
+
+
+def test_permanent_error_is_raised_at_once():
+    fn, calls = failing(StatusError(400))
+    with pytest.raises(StatusError):
+        RetryPolicy(base_delay=0).call(fn)
+    assert len(calls) == 1
+
+
+def test_outages_open_the_breaker():
+    policy = RetryPolicy(
+        max_attempts=2, base_delay=0, breaker_threshold=2,
+        breaker_cooldown=60,
+    )
+    fn, calls = failing(StatusError(503))
+    with pytest.raises(RetriesExhausted):
+        policy.call(fn)
+    assert len(calls) == 2
+    assert policy._before() > 30
+
+
+def test_rate_limits_leave_the_breaker_closed():
+    policy = RetryPolicy(max_attempts=3, base_delay=0, breaker_threshold=1)
+    fn, calls = failing(StatusError(429))
+    with pytest.raises(RetriesExhausted):
+        policy.call(fn)
+    assert len(calls) == 3
+    assert policy.failures == 0
+    assert policy._before() == 0
+
+
+def test_breaker_lets_one_trial_through_after_cooldown():
+    policy = RetryPolicy(base_delay=0.5, breaker_threshold=1)
+    policy.failures = 1
+    assert policy._before() == 0
+    # The trial is still in flight
+    assert policy._before() == 0.5
+    policy._succeeded()
+    assert policy._before() == 0
+
+
+def test_retry_after_is_optional():
+    err = StatusError(429, {"retry-after": "5"})
+    assert RetryPolicy(base_delay=0).backoff(0, err) == 5
+    assert RetryPolicy(base_delay=0, honor_retry_after=False).backoff(
+        0, err
+    ) == 0
@@ -0,0 +1,16 @@
+import time
+
+from nash.dataset.writer import JSONLWriter, read_records
+
+
+def test_flushes_a_quiet_writer(tmp_path):
+    path = tmp_path / "tasks.jsonl"
+    flushed = []
+    with JSONLWriter(
+        str(path), flush_interval=0.05, on_flush=[lambda: flushed.append(1)]
+    ) as writer:
+        writer.write({"index": 0})
+        deadline = time.monotonic() + 5
+        while not flushed and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert list(read_records(str(path))) == [{"index": 0}]